@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+# Times `import main` with python -X importtime and lists the slowest modules.
+# Usage: python import_benchmark.py [module] [budget_ms]
+module = sys.argv[1] if len(sys.argv) > 1 else "main"
+budget_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 500.0
+
+result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+if result.returncode != 0:
+    print(result.stderr.splitlines()[-1] if result.stderr else f"import {module} failed")
+    sys.exit(result.returncode)
+
+# Lines look like "import time:       self [us] |  cumulative | imported package", nested imports are indented by
+# two more spaces and printed before the module that imported them
+children, main_children, total_ms = [], [], 0.0
+for line in result.stderr.splitlines():
+    if not line.startswith("import time:") or "cumulative" in line:
+        continue
+    self_us, cumulative_us, name = line[len("import time:"):].split("|")
+    depth = (len(name) - len(name.lstrip())) // 2
+    if depth == 1:
+        children.append((int(cumulative_us), name.strip()))
+    elif depth == 0:
+        if name.strip() == module:
+            main_children, total_ms = children, int(cumulative_us) / 1000
+        children = []
+
+print(f"import {module}: {total_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+print(f"Slowest imports made by {module}:")
+for cumulative, name in sorted(main_children, reverse=True)[:10]:
+    print(f"  {cumulative / 1000:8.1f} ms  {name}")
+sys.exit(0 if total_ms <= budget_ms else 1)
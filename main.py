@@ -1,21 +1,29 @@
 import os
-import requests
+import json
+import time
+import hashlib
+import tempfile
+import shutil
+import wave
+import sqlite3
+from contextlib import closing, contextmanager
+from collections import OrderedDict
+import bisect
+import math
+import threading
+import multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 import subprocess
-from gtts import gTTS
-import moviepy as mp
-from moviepy import TextClip, CompositeVideoClip, VideoFileClip, concatenate_videoclips, AudioFileClip, vfx
-from moviepy.video.fx import Freeze
-import srt
 from datetime import timedelta
-import openai
 from dotenv import load_dotenv
-import pyperclip
 from colored import fg, attr
 from typing import List
-import nltk
-from nltk.tokenize import sent_tokenize
 import re  # Added import for regex sanitization
 
+# moviepy, numpy, openai, gtts, nltk, srt, requests and pyperclip are imported inside the functions that use
+# them, so `python main.py --help` and render worker processes start without paying for the whole stack.
+# Run import_benchmark.py to check how long `import main` takes.
+
 # Load environment variables
 load_dotenv()
 
@@ -27,119 +35,892 @@ YOUTUBE_UPLOAD_FOLDER = os.getenv('YOUTUBE_UPLOAD_FOLDER')
 SUBTITLE_OUTPUT_FOLDER = os.getenv('SUBTITLE_OUTPUT_FOLDER')
 DOWNLOADED_VIDEO_FOLDER = os.getenv('DOWNLOADED_VIDEO_FOLDER')
 
+# Output video size and frame rate
+TARGET_WIDTH = int(os.getenv('RENDER_WIDTH', 1080))
+TARGET_HEIGHT = int(os.getenv('RENDER_HEIGHT', 1920))
+TARGET_FPS = int(os.getenv('RENDER_FPS', 24))
+
+# Subtitle style
+SUBTITLE_FONT = os.getenv('SUBTITLE_FONT', 'C:/Windows/Fonts/arial.ttf')
+SUBTITLE_FONT_SIZE = int(os.getenv('SUBTITLE_FONT_SIZE', 32))
+SUBTITLE_COLOR = os.getenv('SUBTITLE_COLOR', 'yellow')
+SUBTITLE_STROKE_WIDTH = int(os.getenv('SUBTITLE_STROKE_WIDTH', 2))
+SUBTITLE_STROKE_COLOR = os.getenv('SUBTITLE_STROKE_COLOR', 'black')
+SUBTITLE_FONT_NAME = os.getenv('SUBTITLE_FONT_NAME')  # font family for libass, defaults to the font file name
+SUBTITLE_MODE = os.getenv('SUBTITLE_MODE', 'burn')  # 'burn' into the picture or 'soft' (mov_text track, no re-encode)
+
+# Subtitle timing from the voiceover audio, used when the per-sentence durations were not recorded
+SILENCE_THRESHOLD = float(os.getenv('SILENCE_THRESHOLD', 0.05))  # fraction of the loudest 10 ms frame
+MIN_PAUSE_FRAMES = 15  # 150 ms of silence counts as a pause
+PAUSE_SNAP_FRAMES = 100  # a sentence boundary moves to a pause at most 1 s away
+
+# Also write {topic}_final.mp4 without subtitles (costs a second encode)
+WRITE_UNSUBTITLED = os.getenv('WRITE_UNSUBTITLED', '0') == '1'
+
+# Render engine - 'moviepy' composites frames in Python, 'ffmpeg' runs the whole timeline as one ffmpeg filtergraph
+RENDER_ENGINE = os.getenv('RENDER_ENGINE', 'moviepy')
+FFMPEG_PRESET = os.getenv('FFMPEG_PRESET', 'medium')  # libx264 preset used by the ffmpeg engine
+
+# Parallel rendering - the timeline is split into keyframe-aligned chunks rendered on a process pool
+PARALLEL_RENDER = os.getenv('PARALLEL_RENDER', '0') == '1'
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', os.cpu_count() or 1))
+RENDER_CHUNK_SECONDS = float(os.getenv('RENDER_CHUNK_SECONDS', 4))
+
+# Proxies - each stock clip is transcoded once to a cropped RENDER_WIDTH x RENDER_HEIGHT, RENDER_FPS intermediate
+USE_PROXIES = os.getenv('USE_PROXIES', '0') == '1'
+PROXY_FOLDER = os.getenv('PROXY_FOLDER')  # defaults to DOWNLOADED_VIDEO_FOLDER/proxies
+PROXY_WORKERS = int(os.getenv('PROXY_WORKERS', 2))
+file_hashes = {}
+
+# Media probing (duration, size, fps) - FFPROBE_BINARY overrides the ffprobe found on PATH
+FFPROBE_BINARY = os.getenv('FFPROBE_BINARY')
+media_probes = {}
+
+# Rendered subtitle sprites, see subtitle_sprite() - least recently used ones are dropped past the limit
+SUBTITLE_SPRITE_CACHE_SIZE = int(os.getenv('SUBTITLE_SPRITE_CACHE_SIZE', 256))
+subtitle_sprites = OrderedDict()
+subtitle_sprites_lock = threading.Lock()
+
+# Script generation settings (also part of the script cache key)
+SCRIPT_MODEL = "gpt-3.5-turbo"
+SCRIPT_TEMPERATURE = 0.7
+SCRIPT_MAX_TOKENS = 600
+SCRIPT_SYSTEM_PROMPT = "You are an informative and engaging YouTube video script writer."
+SCRIPT_PROMPT = "Write a detailed, engaging, and educational explanation of the topic {topic}, formatted like a YouTube video script. Include an introduction, clear main points, and a conclusion, all flowing naturally without special characters, scene settings, or stage directions. Keep the explanation concise, around 100 words, and in a single continuous line."
+
+# Script cache - one LLM call per topic, re-renders of a topic reuse the cached script
+SCRIPT_CACHE_FOLDER = os.getenv('SCRIPT_CACHE_FOLDER', 'script_cache')
+SCRIPT_CACHE_TTL = float(os.getenv('SCRIPT_CACHE_TTL', 30 * 24 * 3600))  # seconds
+SCRIPT_CACHE_MAX_ENTRIES = int(os.getenv('SCRIPT_CACHE_MAX_ENTRIES', 500))
+
+# Hedged LLM calls - if a provider has not answered within LLM_HEDGE_DELAY seconds the next one is fired as well
+LLM_HEDGE_MODE = os.getenv('LLM_HEDGE_MODE', '1') == '1'
+LLM_HEDGE_DELAY = float(os.getenv('LLM_HEDGE_DELAY', 8))  # seconds
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', 30))  # seconds
+CLAUDE_TIMEOUT = float(os.getenv('CLAUDE_TIMEOUT', 30))  # seconds
+LATENCY_BUCKETS = (0.5, 1, 2, 4, 8, 16, 32, 64)  # seconds
+provider_latencies = {}  # provider name -> [(seconds, ok), ...]
+provider_latency_lock = threading.Lock()
+
+# What to do when every provider fails to write a script:
+# 'prompt' - copy the prompt to the clipboard and ask for a pasted script (interactive runs only, headless runs use 'cached')
+# 'cached' - use the last cached script for the topic however old it is, fail when there is none
+# 'skip'   - skip the topic
+# 'retry'  - put the topic on the batch retry queue and try it again later
+# 'fail'   - fail the topic
+SCRIPT_FAILURE_POLICY = os.getenv('SCRIPT_FAILURE_POLICY', 'prompt')
+SCRIPT_RETRY_ROUNDS = int(os.getenv('SCRIPT_RETRY_ROUNDS', 2))  # batch passes over the retry queue
+SCRIPT_RETRY_DELAY = float(os.getenv('SCRIPT_RETRY_DELAY', 300))  # seconds before each retry pass
+headless = os.getenv('HEADLESS', '0') == '1'  # never read stdin or the clipboard, batch mode turns this on
+
+# Streaming mode - voiceover sentences are synthesized while the script is still being written
+STREAM_SCRIPT = os.getenv('STREAM_SCRIPT', '0') == '1'
+
+# Voiceover sentences are synthesized on this many threads at once
+TTS_WORKERS = int(os.getenv('TTS_WORKERS', 4))
+
+# TTS settings, all of them are part of the TTS segment cache key
+TTS_ENGINE = os.getenv('TTS_ENGINE', 'gtts')  # 'gtts' or 'pyttsx3' (offline)
+TTS_LANG = os.getenv('TTS_LANG', 'en')
+TTS_VOICE = os.getenv('TTS_VOICE')  # gTTS accent domain or pyttsx3 voice id, engine default when unset
+TTS_CACHE_MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_BYTES', 500 * 1024 * 1024))
+tts_cache_stats = {"hits": 0, "misses": 0, "synthesis_seconds": 0.0, "saved_seconds": 0.0}
+tts_cache_lock = threading.Lock()
+
+# Stock video downloads
+DOWNLOAD_WORKERS = int(os.getenv('DOWNLOAD_WORKERS', 5))
+DOWNLOAD_RETRIES = int(os.getenv('DOWNLOAD_RETRIES', 4))
+DOWNLOAD_TIMEOUT = float(os.getenv('DOWNLOAD_TIMEOUT', 30))  # seconds without data before giving up on a connection
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Stock video library - every Pexels clip is stored once, by video ID and rendition, and shared between topics
+STOCK_LIBRARY_FOLDER = os.getenv('STOCK_LIBRARY_FOLDER')  # defaults to DOWNLOADED_VIDEO_FOLDER/library
+STOCK_LIBRARY_MAX_BYTES = int(os.getenv('STOCK_LIBRARY_MAX_BYTES', 5 * 1024 ** 3))
+library_locks = {}
+library_locks_guard = threading.Lock()
+pinned_clips = {}  # topic -> clips and proxies it will still render from, never evicted
+pinned_clips_lock = threading.Lock()
+
+# Cache eviction (scripts, TTS segments, stock library) runs one at a time, batch workers share the folders
+eviction_lock = threading.Lock()
+
+# Pexels search cache (SQLite) - keeps batch runs over similar topics well inside the Pexels rate limits
+SEARCH_CACHE_DB = os.getenv('SEARCH_CACHE_DB')  # defaults to DOWNLOADED_VIDEO_FOLDER/pexels_search.sqlite3
+PEXELS_SEARCH_TTL = float(os.getenv('PEXELS_SEARCH_TTL', 24 * 3600))  # seconds results are served as fresh
+PEXELS_SEARCH_STALE = float(os.getenv('PEXELS_SEARCH_STALE', 7 * 24 * 3600))  # seconds past the TTL served while refreshing
+search_refreshes = set()
+search_refresh_lock = threading.Lock()
+
+# Smallest crop window a stock rendition must have, as a fraction of the output size (below 1 allows some upscaling)
+RENDITION_MIN_SCALE = float(os.getenv('RENDITION_MIN_SCALE', 1.0))
+
+# Stage commands (python main.py script|voice|subs|fetch|plan|render|all "topic") keep one manifest per topic here
+ARTIFACT_FOLDER = os.getenv('ARTIFACT_FOLDER', 'artifacts')
+
+# Batch mode (python main.py batch topics.txt) - threads for the network stages, fewer slots for the CPU bound renders
+BATCH_IO_WORKERS = int(os.getenv('BATCH_IO_WORKERS', 4))
+BATCH_RENDER_WORKERS = int(os.getenv('BATCH_RENDER_WORKERS', max(1, (os.cpu_count() or 1) // 4)))
+
+
+def atomic_write_text(path, text):
+    # Write to a temp file in the same folder, then rename over the target so readers never see half a file
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+# Context manager for writers that need a file name (ffmpeg, moviepy, wave) - yields a temp path next to the target
+# with the same extension, and only renames it over the target once the block finishes without an error
+@contextmanager
+def atomic_output(path):
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+    stem, extension = os.path.splitext(path)
+    temp_path = f"{stem}.{os.getpid()}.{threading.get_ident()}.part{extension}"
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def build_script_prompt(topic):
+    return SCRIPT_PROMPT.format(topic=topic)
+
+
+def normalize_topic(topic):
+    # "Chicken  and Eggs " and "chicken and eggs" should share a cache entry
+    return " ".join(topic.lower().split())
+
+
+def script_cache_key(topic, model=SCRIPT_MODEL, temperature=SCRIPT_TEMPERATURE):
+    key_source = json.dumps([normalize_topic(topic), SCRIPT_SYSTEM_PROMPT, SCRIPT_PROMPT, model, temperature])
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
 
-# Function to generate the script using GPT-3.5, backup OpenAI key, or Claude
+
+def load_cached_script(cache_key, max_age=SCRIPT_CACHE_TTL):
+    # max_age=None ignores the TTL and returns any stored script
+    cache_path = os.path.join(SCRIPT_CACHE_FOLDER, f"{cache_key}.json")
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if max_age is not None and time.time() - entry.get("created", 0) > max_age:
+        return None
+    return entry.get("script") or None
+
+
+def save_cached_script(cache_key, topic, script):
+    entry = {"topic": topic, "created": time.time(), "model": SCRIPT_MODEL,
+             "temperature": SCRIPT_TEMPERATURE, "script": script}
+    atomic_write_text(os.path.join(SCRIPT_CACHE_FOLDER, f"{cache_key}.json"), json.dumps(entry))
+    evict_script_cache()
+
+
+def evict_script_cache():
+    # Drop the oldest entries until we are back under the size limit. Expired entries are kept (they are no longer
+    # served as fresh) so SCRIPT_FAILURE_POLICY=cached still has a script to fall back on
+    if not os.path.isdir(SCRIPT_CACHE_FOLDER):
+        return
+    with eviction_lock:
+        entries = []
+        for name in os.listdir(SCRIPT_CACHE_FOLDER):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(SCRIPT_CACHE_FOLDER, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        entries.sort()
+        for mtime, path in entries[:max(0, len(entries) - SCRIPT_CACHE_MAX_ENTRIES)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # already gone
+
+
+# Function to generate the script, served from the script cache when possible
 def generate_script(topic):
+    cache_key = script_cache_key(topic)
+    script = load_cached_script(cache_key)
+    if script:
+        print(f"{fg('cyan')}Using cached script for topic: {topic}{attr('reset')}")
+        return script
+    try:
+        script = request_script(topic)
+    except ScriptUnavailable as e:
+        script = load_cached_script(cache_key, max_age=None) if e.policy == "cached" else None
+        if not script:
+            raise
+        # Not saved again, so the expired script is not passed off as fresh and the next run asks the providers
+        print(f"{fg('yellow')}Using the last cached script for topic: {topic}{attr('reset')}")
+        return script
+    save_cached_script(cache_key, topic, script)
+    return script
+
+
+class ScriptUnavailable(Exception):
+    # Raised when no script could be written for a topic, policy is the SCRIPT_FAILURE_POLICY that gave up
+    def __init__(self, topic, policy):
+        super().__init__(f"No script for topic '{topic}' (failure policy: {policy})")
+        self.topic = topic
+        self.policy = policy
+
+
+# Function to call OpenAI chat completions with a given key
+def call_openai(api_key, prompt_text, timeout):
+    import openai
+    response = openai.ChatCompletion.create(
+        api_key=api_key,  # passed per call so hedged requests do not fight over openai.api_key
+        model=SCRIPT_MODEL,
+        messages=[{
+            "role": "system", "content": SCRIPT_SYSTEM_PROMPT
+        }, {
+            "role": "user",
+            "content": prompt_text,
+        }],
+        temperature=SCRIPT_TEMPERATURE,
+        max_tokens=SCRIPT_MAX_TOKENS,
+        request_timeout=timeout,
+    )
+    return response['choices'][0]['message']['content']
+
+
+# Function to call the Claude completion endpoint
+def call_claude(api_key, prompt_text, timeout):
+    import requests
+    claude_url = "https://api.anthropic.com/v1/complete"
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    data = {
+        "prompt": prompt_text,
+        "max_tokens": SCRIPT_MAX_TOKENS,
+        "temperature": SCRIPT_TEMPERATURE
+    }
+    response = requests.post(claude_url, headers=headers, json=data, timeout=timeout)
+    response.raise_for_status()
+    return response.json()['completion']
+
+
+def record_provider_latency(name, seconds, ok):
+    with provider_latency_lock:
+        provider_latencies.setdefault(name, []).append((seconds, ok))
+
+
+def provider_latency_histogram(name):
+    # Returns [(bucket upper bound in seconds, count), ...], the last bucket (None) catches everything slower
+    counts = [0] * (len(LATENCY_BUCKETS) + 1)
+    with provider_latency_lock:
+        samples = list(provider_latencies.get(name, []))
+    for seconds, ok in samples:
+        counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+    return list(zip(list(LATENCY_BUCKETS) + [None], counts))
+
+
+def print_provider_latency_stats():
+    with provider_latency_lock:
+        names = sorted(provider_latencies)
+    for name in names:
+        with provider_latency_lock:
+            samples = sorted(seconds for seconds, ok in provider_latencies[name])
+            failures = sum(1 for seconds, ok in provider_latencies[name] if not ok)
+        p50 = samples[len(samples) // 2]
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        buckets = ", ".join(f"{'<=' + str(upper) + 's' if upper is not None else 'slower'}: {count}"
+                            for upper, count in provider_latency_histogram(name) if count)
+        print(f"{fg('cyan')}{name}: {len(samples)} calls, {failures} failed, p50 {p50:.2f}s, p95 {p95:.2f}s ({buckets}){attr('reset')}")
+
+
+def timed_provider_call(name, call):
+    started = time.perf_counter()
+    try:
+        script = call()
+        if not script or not script.strip():
+            raise ValueError("empty script returned")
+    except Exception:
+        record_provider_latency(name, time.perf_counter() - started, False)
+        raise
+    record_provider_latency(name, time.perf_counter() - started, True)
+    return script
+
+
+# Function to race the providers - the next one is fired when the current one fails or is slower than hedge_delay
+# hedge_delay=None only moves on after a failure, which is the old one-after-another behaviour
+# Function to run a provider call on a daemon thread and return its Future
+# A blocking HTTP request can not be cancelled, so a call that lost the race keeps running until its own timeout,
+# but on a daemon thread it no longer keeps the program alive once the video is done
+def start_provider_call(name, call):
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(timed_provider_call(name, call))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=f"script-{name}", daemon=True).start()
+    return future
+
+
+def race_script_providers(providers, hedge_delay):
+    pending = {}
+    next_provider = 0
+
+    def launch_next():
+        nonlocal next_provider
+        name, call = providers[next_provider]
+        next_provider += 1
+        pending[start_provider_call(name, call)] = name
+
+    launch_next()
+    while pending:
+        has_more = next_provider < len(providers)
+        done, _ = wait(pending, timeout=hedge_delay if has_more else None, return_when=FIRST_COMPLETED)
+        if not done:
+            print(f"{fg('yellow')}No response after {hedge_delay}s, also trying {providers[next_provider][0]} API...{attr('reset')}")
+            launch_next()
+            continue
+        for future in done:
+            name = pending.pop(future)
+            try:
+                return name, future.result()
+            except Exception as e:
+                print(f"{fg('red')}Error with {name} API: {e}{attr('reset')}")
+                if next_provider < len(providers):
+                    launch_next()
+    return None, None
+
+
+# Function to request the script using GPT-3.5, backup OpenAI key, or Claude
+def request_script(topic):
     print(f"{fg('blue')}Generating script for topic: {topic}...{attr('reset')}")
     load_dotenv()
     openai_api_key = os.getenv("OPENAI_API_KEY")
     backup_openai_api_key = os.getenv("BACKUP_OPENAI_API_KEY")
     claude_api_key = os.getenv("CLAUDE_API_KEY")
+    prompt_text = build_script_prompt(topic)
 
     if not openai_api_key and not backup_openai_api_key:
         print(f"{fg('red')}Error: Missing both primary and backup OpenAI API keys in .env file.{attr('reset')}")
-        exit(1)
+        return script_failure(topic, prompt_text)
+
+    providers = []
+    if openai_api_key:
+        providers.append(("primary OpenAI", lambda: call_openai(openai_api_key, prompt_text, OPENAI_TIMEOUT)))
+    if backup_openai_api_key:
+        providers.append(("backup OpenAI", lambda: call_openai(backup_openai_api_key, prompt_text, OPENAI_TIMEOUT)))
+    else:
+        print(f"{fg('yellow')}No backup OpenAI API key provided. Claude API will be used as the fallback.{attr('reset')}")
+    if claude_api_key:
+        providers.append(("Claude", lambda: call_claude(claude_api_key, prompt_text, CLAUDE_TIMEOUT)))
+
+    provider_name, script = race_script_providers(providers, LLM_HEDGE_DELAY if LLM_HEDGE_MODE else None)
+    if script:
+        print(f"{fg('green')}Script generated successfully using {provider_name} API!{attr('reset')}")
+        return script
 
-    try:
-        openai.api_key = openai_api_key
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{
-                "role": "system", "content": "You are an informative and engaging YouTube video script writer."
-            }, {
-                "role": "user",
-                "content": f"Write a detailed, engaging, and educational explanation of the topic {topic}, formatted like a YouTube video script. Include an introduction, clear main points, and a conclusion, all flowing naturally without special characters, scene settings, or stage directions. Keep the explanation concise, around 100 words, and in a single continuous line.",
-            }],
-            temperature=0.7,
-            max_tokens=600,
-        )
-        script = response['choices'][0]['message']['content']
-        print(f"{fg('green')}Script generated successfully using GPT-3.5!{attr('reset')}")
+    print(f"{fg('yellow')}Both GPT-3.5 and Claude failed to generate the script.{attr('reset')}")
+    return script_failure(topic, prompt_text)
+
+
+# Function to apply SCRIPT_FAILURE_POLICY once every provider has failed - returns a pasted script or raises
+# ScriptUnavailable
+def script_failure(topic, prompt_text):
+    import sys
+    policy = SCRIPT_FAILURE_POLICY
+    if policy == "prompt" and (headless or not sys.stdin.isatty()):
+        policy = "cached"  # nobody is there to paste a script
+
+    if policy != "prompt":
+        # generate_script falls back to the last cached script for 'cached'
+        raise ScriptUnavailable(topic, policy)
+
+    import pyperclip
+    pyperclip.copy(prompt_text)
+    print(f"{fg('yellow')}The prompt has been copied to your clipboard. Please paste it into ChatGPT at https://chat.openai.com/{attr('reset')}")
+    user_choice = input(f"{fg('blue')}Would you like to manually input the script or exit the program? (Type '1' to enter script, 'exit' to quit): {attr('reset')} ").strip().lower()
+    if user_choice == "1":
+        script = input(f"{fg('blue')}Please paste the script you generated: {attr('reset')}")
+        print(f"{fg('green')}Script received successfully!{attr('reset')}")
         return script
-    except Exception as e:
-        print(f"{fg('red')}Error with primary OpenAI API: {e}{attr('reset')}")
-        if backup_openai_api_key:
-            try:
-                openai.api_key = backup_openai_api_key
-                response = openai.ChatCompletion.create(
-                    model="gpt-3.5-turbo",
-                    messages=[{
-                        "role": "system", "content": "You are an informative and engaging YouTube video script writer."
-                    }, {
-                        "role": "user",
-                        "content": f"Write a detailed, engaging, and educational explanation of the topic {topic}, formatted like a YouTube video script. Include an introduction, clear main points, and a conclusion, all flowing naturally without special characters, scene settings, or stage directions. Keep the explanation concise, around 100 words, and in a single continuous line.",
-                    }],
-                    temperature=0.7,
-                    max_tokens=600,
-                )
-                script = response['choices'][0]['message']['content']
-                print(f"{fg('green')}Script generated successfully using backup OpenAI API!{attr('reset')}")
-                return script
-            except Exception as e:
-                print(f"{fg('red')}Error with backup OpenAI API: {e}{attr('reset')}")
-        else:
-            print(f"{fg('yellow')}No backup OpenAI API key provided. Trying Claude API...{attr('reset')}")
+    else:
+        print(f"{fg('red')}Exiting the program.{attr('reset')}")
+        exit(0)
 
-        try:
-            claude_url = "https://api.anthropic.com/v1/complete"
-            headers = {"Authorization": f"Bearer {claude_api_key}", "Content-Type": "application/json"}
-            data = {
-                "prompt": f"Write a detailed, engaging, and educational explanation of the topic {topic}, formatted like a YouTube video script. Include an introduction, clear main points, and a conclusion, all flowing naturally without special characters, scene settings, or stage directions. Keep the explanation concise, around 100 words, and in a single continuous line.",
-                "max_tokens": 600,
-                "temperature": 0.7
-            }
-            response = requests.post(claude_url, headers=headers, json=data)
-            response.raise_for_status()
-            claude_script = response.json()['completion']
-            print(f"{fg('green')}Script generated successfully using Claude!{attr('reset')}")
-            return claude_script
-        except Exception as e:
-            print(f"{fg('red')}Error with Claude API: {e}{attr('reset')}")
-            print(f"{fg('yellow')}Both GPT-3.5 and Claude failed to generate the script.{attr('reset')}")
-            prompt_text = f"Write a detailed, engaging, and educational explanation of the topic {topic}, formatted like a YouTube video script. Include an introduction, clear main points, and a conclusion, all flowing naturally without special characters, scene settings, or stage directions. Keep the explanation concise, around 100 words, and in a single continuous line."
-            pyperclip.copy(prompt_text)
-            print(f"{fg('yellow')}The prompt has been copied to your clipboard. Please paste it into ChatGPT at https://chat.openai.com/{attr('reset')}")
-            user_choice = input(f"{fg('blue')}Would you like to manually input the script or exit the program? (Type '1' to enter script, 'exit' to quit): {attr('reset')} ").strip().lower()
-            if user_choice == "1":
-                script = input(f"{fg('blue')}Please paste the script you generated: {attr('reset')}")
-                print(f"{fg('green')}Script received successfully!{attr('reset')}")
-                return script
-            else:
-                print(f"{fg('red')}Exiting the program.{attr('reset')}")
-                exit(0)
-
-
-# Function to generate voiceover
+
+# Function to generate voiceover - sentences are synthesized in parallel and joined into one file
 def generate_voiceover(script, topic):
+    from nltk.tokenize import sent_tokenize
     print(f"DEBUG: Full script to be converted to voiceover:\n{script}")  # Debugging line
-    tts = gTTS(text=script, lang='en')
-    audio_path = os.path.join(AUDIO_OUTPUT, f"{topic}.mp3")
-    tts.save(audio_path)
-    print(f"DEBUG: Voiceover for {topic} has been successfully generated!")
+    started = time.perf_counter()
+    backend = get_tts_backend()
+    audio_path = voiceover_path_for(topic, backend)
+    synthesize_voiceover(sent_tokenize(script), audio_path, backend)
+    print(f"DEBUG: Voiceover for {topic} has been successfully generated in {time.perf_counter() - started:.2f}s!")
     return audio_path
 
 
+# Function to stream the script from OpenAI, yielding each sentence as soon as it is complete
+def stream_script_sentences(topic):
+    import openai
+    from nltk.tokenize import sent_tokenize
+    cache_key = script_cache_key(topic)
+    script = load_cached_script(cache_key)
+    if script:
+        print(f"{fg('cyan')}Using cached script for topic: {topic}{attr('reset')}")
+        yield from sent_tokenize(script)
+        return
 
-# Function to fetch stock videos
-def search_for_stock_videos(query: str, api_key: str, it: int, min_dur: int) -> List[str]:
+    print(f"{fg('blue')}Streaming script for topic: {topic}...{attr('reset')}")
+    load_dotenv()
+    api_keys = [key for key in (os.getenv("OPENAI_API_KEY"), os.getenv("BACKUP_OPENAI_API_KEY")) if key]
+    emitted = []
+    for api_key in api_keys:
+        buffer = ""
+        try:
+            response = openai.ChatCompletion.create(
+                api_key=api_key,
+                model=SCRIPT_MODEL,
+                messages=[{
+                    "role": "system", "content": SCRIPT_SYSTEM_PROMPT
+                }, {
+                    "role": "user",
+                    "content": build_script_prompt(topic),
+                }],
+                temperature=SCRIPT_TEMPERATURE,
+                max_tokens=SCRIPT_MAX_TOKENS,
+                request_timeout=OPENAI_TIMEOUT,
+                stream=True,
+            )
+            for chunk in response:
+                buffer += chunk['choices'][0].get('delta', {}).get('content') or ""
+                sentences = sent_tokenize(buffer)
+                # Everything but the last sentence is finished, the last one may still be growing
+                for sentence in sentences[:-1]:
+                    emitted.append(sentence)
+                    yield sentence
+                buffer = sentences[-1] if sentences else ""
+        except Exception as e:
+            print(f"{fg('red')}Error streaming from OpenAI API: {e}{attr('reset')}")
+            if not emitted:
+                continue  # nothing spoken yet, so the next key can start from scratch
+            print(f"{fg('yellow')}Stream broke after {len(emitted)} sentences, script will be incomplete and not cached.{attr('reset')}")
+            yield from sent_tokenize(buffer)
+            return
+        for sentence in sent_tokenize(buffer):
+            emitted.append(sentence)
+            yield sentence
+        if emitted:
+            save_cached_script(cache_key, topic, " ".join(emitted))
+            return
+
+    # Streaming is not available, fall back to the normal (hedged) request
+    yield from sent_tokenize(generate_script(topic))
+
+
+# Base class for voiceover engines - subclasses implement synthesize(), batch engines also override synthesize_many()
+class TTSBackend:
+    engine = ""
+    extension = ".mp3"
+    default_voice = None
+
+    def __init__(self, lang=None, voice=None):
+        self.lang = lang or TTS_LANG
+        self.voice = voice or self.default_voice
+
+    def synthesize(self, sentence, segment_path):
+        raise NotImplementedError
+
+    # Synthesize a list of sentences into the matching segment paths, by default one sentence per thread
+    def synthesize_many(self, sentences, segment_paths):
+        with ThreadPoolExecutor(max_workers=TTS_WORKERS) as executor:
+            return list(executor.map(self.synthesize, sentences, segment_paths))
+
+
+# Google Translate TTS, needs network access and is rate limited
+class GTTSBackend(TTSBackend):
+    engine = "gtts"
+    extension = ".mp3"
+    default_voice = "com"  # gTTS accent, picked through the Google Translate domain
+
+    def synthesize(self, sentence, segment_path):
+        from gtts import gTTS
+        gTTS(text=sentence, lang=self.lang, tld=self.voice).save(segment_path)
+        return segment_path
+
+
+# Offline TTS through pyttsx3 (espeak / SAPI5 / NSSpeechSynthesizer), writes wav files
+class Pyttsx3Backend(TTSBackend):
+    engine = "pyttsx3"
+    extension = ".wav"
+
+    def __init__(self, lang=None, voice=None):
+        super().__init__(lang, voice)
+        self.lock = threading.Lock()  # a pyttsx3 engine can only run one loop at a time
+
+    def synthesize(self, sentence, segment_path):
+        return self.synthesize_many([sentence], [segment_path])[0]
+
+    # Queue every sentence on one engine and run it once, much cheaper than one engine loop per sentence
+    def synthesize_many(self, sentences, segment_paths):
+        import pyttsx3
+        with self.lock:
+            engine = pyttsx3.init()
+            if self.voice:
+                engine.setProperty('voice', self.voice)
+            for sentence, segment_path in zip(sentences, segment_paths):
+                engine.save_to_file(sentence, segment_path)
+            engine.runAndWait()
+            engine.stop()
+        return list(segment_paths)
+
+
+TTS_BACKENDS = {GTTSBackend.engine: GTTSBackend, Pyttsx3Backend.engine: Pyttsx3Backend}
+
+
+def get_tts_backend(engine=None):
+    engine = engine or TTS_ENGINE
+    if engine not in TTS_BACKENDS:
+        raise ValueError(f"Unknown TTS_ENGINE '{engine}', expected one of: {', '.join(TTS_BACKENDS)}")
+    return TTS_BACKENDS[engine](TTS_LANG, TTS_VOICE)
+
+
+def tts_cache_folder():
+    return os.path.join(AUDIO_OUTPUT, "tts_cache")
+
+
+def tts_cache_key(sentence, lang, engine, voice):
+    return hashlib.sha256(json.dumps([sentence, lang, engine, voice]).encode("utf-8")).hexdigest()
+
+
+# Function to synthesize sentences through the TTS cache, the backend is only called for the misses
+# Returns the paths of the cached segments, in the same order as the sentences
+def synthesize_many_cached(backend, sentences, segment_paths):
+    cached_paths = []
+    misses = []
+    for sentence, segment_path in zip(sentences, segment_paths):
+        key = tts_cache_key(sentence, backend.lang, backend.engine, backend.voice)
+        cached_path = os.path.join(tts_cache_folder(), f"{key}{backend.extension}")
+        cached_paths.append(cached_path)
+        if not os.path.exists(cached_path):
+            misses.append((sentence, segment_path, cached_path))
+            continue
+        os.utime(cached_path)  # mark as recently used for the LRU eviction
+        try:
+            with open(os.path.join(tts_cache_folder(), f"{key}.json"), "r", encoding="utf-8") as f:
+                saved_seconds = json.load(f)["synthesis_seconds"]
+        except (OSError, ValueError, KeyError):
+            saved_seconds = 0.0
+        with tts_cache_lock:
+            tts_cache_stats["hits"] += 1
+            tts_cache_stats["saved_seconds"] += saved_seconds
+
+    if misses:
+        started = time.perf_counter()
+        backend.synthesize_many([miss[0] for miss in misses], [miss[1] for miss in misses])
+        elapsed = time.perf_counter() - started
+        for sentence, segment_path, cached_path in misses:
+            info_path = os.path.splitext(cached_path)[0] + ".json"
+            atomic_write_text(info_path, json.dumps({"text": sentence, "synthesis_seconds": elapsed / len(misses)}))
+            temp_path = f"{cached_path}.{threading.get_ident()}.tmp"
+            shutil.copyfile(segment_path, temp_path)
+            os.replace(temp_path, cached_path)
+        with tts_cache_lock:
+            tts_cache_stats["misses"] += len(misses)
+            tts_cache_stats["synthesis_seconds"] += elapsed
+    return cached_paths
+
+
+# Function to drop the least recently used cached segments until the cache fits in TTS_CACHE_MAX_BYTES
+def evict_tts_cache():
+    folder = tts_cache_folder()
+    if not os.path.isdir(folder):
+        return
+    with eviction_lock:
+        entries = []
+        for name in os.listdir(folder):
+            if name.endswith((".mp3", ".wav")):
+                try:
+                    stat = os.stat(os.path.join(folder, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total_bytes = sum(size for mtime, size, name in entries)
+        for mtime, size, name in sorted(entries):
+            if total_bytes <= TTS_CACHE_MAX_BYTES:
+                break
+            key = os.path.splitext(name)[0]
+            for leftover in (name, f"{key}.json"):
+                try:
+                    os.remove(os.path.join(folder, leftover))
+                except FileNotFoundError:
+                    pass
+            total_bytes -= size
+
+
+def print_tts_cache_stats():
+    with tts_cache_lock:
+        stats = dict(tts_cache_stats)
+    print(f"{fg('cyan')}TTS cache: {stats['hits']} hits, {stats['misses']} misses, "
+          f"{stats['synthesis_seconds']:.1f}s spent synthesizing, ~{stats['saved_seconds']:.1f}s saved{attr('reset')}")
+
+
+# Function to join audio segments into one file
+# mp3 segments are appended frame by frame (gTTS joins its own chunks the same way), wav segments are re-wrapped
+def join_audio_segments(segment_paths, audio_path):
+    with atomic_output(audio_path) as partial_path:
+        if audio_path.lower().endswith(".wav"):
+            with wave.open(partial_path, "wb") as out_file:
+                for index, segment_path in enumerate(segment_paths):
+                    with wave.open(segment_path, "rb") as segment_file:
+                        if index == 0:
+                            out_file.setparams(segment_file.getparams())
+                        out_file.writeframes(segment_file.readframes(segment_file.getnframes()))
+        else:
+            with open(partial_path, "wb") as out_file:
+                for segment_path in segment_paths:
+                    with open(segment_path, "rb") as segment_file:
+                        shutil.copyfileobj(segment_file, out_file)
+    return audio_path
+
+
+# MPEG audio layer III bitrates in kbps, indexed by the 4-bit bitrate field
+MP3_BITRATES_MPEG1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+MP3_BITRATES_MPEG2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+
+
+# Function to get the exact length of an mp3 by walking its frame headers, no decoding needed
+def mp3_duration(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    position = 0
+    if data[:3] == b"ID3":  # skip the ID3v2 tag, its size is stored as a 28-bit synchsafe integer
+        position = 10 + ((data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9])
+    duration = 0.0
+    while position + 4 <= len(data):
+        version_bits = (data[position + 1] >> 3) & 3  # 3 = MPEG1, 2 = MPEG2, 0 = MPEG2.5
+        layer_bits = (data[position + 1] >> 1) & 3  # 1 = layer III
+        bitrate_index = data[position + 2] >> 4
+        rate_index = (data[position + 2] >> 2) & 3
+        if (data[position] != 0xFF or (data[position + 1] & 0xE0) != 0xE0 or version_bits == 1
+                or layer_bits != 1 or bitrate_index in (0, 15) or rate_index == 3):
+            position += 1  # not a frame header, resync
+            continue
+        mpeg1 = version_bits == 3
+        bitrate = (MP3_BITRATES_MPEG1 if mpeg1 else MP3_BITRATES_MPEG2)[bitrate_index] * 1000
+        sample_rate = (44100, 48000, 32000)[rate_index] >> {3: 0, 2: 1, 0: 2}[version_bits]
+        samples = 1152 if mpeg1 else 576
+        padding = (data[position + 2] >> 1) & 1
+        position += samples // 8 * bitrate // sample_rate + padding
+        duration += samples / sample_rate
+    return duration
+
+
+# Function to get an audio file's duration without opening a decoder
+def audio_duration(path):
+    if path.lower().endswith(".mp3"):
+        return mp3_duration(path)
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as wav_file:
+            return wav_file.getnframes() / wav_file.getframerate()
+    return probe_media(path)["duration"]
+
+
+def voiceover_segments_path(audio_path):
+    return os.path.splitext(audio_path)[0] + ".segments.json"
+
+
+# Function to record the text, start and duration of every sentence in a voiceover
+def save_voiceover_segments(audio_path, sentences, durations):
+    segments = []
+    start = 0.0
+    for sentence, duration in zip(sentences, durations):
+        segments.append({"text": sentence, "start": round(start, 4), "duration": round(duration, 4)})
+        start += duration
+    atomic_write_text(voiceover_segments_path(audio_path), json.dumps(segments, indent=2))
+
+
+def load_voiceover_segments(audio_path):
+    try:
+        with open(voiceover_segments_path(audio_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# Function to synthesize sentences and join them into audio_path, returns the sentences
+# A list is synthesized as one batch; a generator (streaming) is submitted sentence by sentence as it is produced
+def synthesize_voiceover(sentences, audio_path, backend=None):
+    backend = backend or get_tts_backend()
+    started = time.perf_counter()
+    os.makedirs(tts_cache_folder(), exist_ok=True)
+    segment_folder = tempfile.mkdtemp(prefix="segments_", dir=AUDIO_OUTPUT)
+    try:
+        if isinstance(sentences, list):
+            texts = sentences
+            temp_paths = [os.path.join(segment_folder, f"{index:04d}{backend.extension}") for index in range(len(texts))]
+            segment_paths = synthesize_many_cached(backend, texts, temp_paths)
+        else:
+            texts = []
+            segment_futures = []
+            with ThreadPoolExecutor(max_workers=TTS_WORKERS) as executor:
+                for sentence in sentences:
+                    temp_path = os.path.join(segment_folder, f"{len(texts):04d}{backend.extension}")
+                    texts.append(sentence)
+                    segment_futures.append(executor.submit(synthesize_many_cached, backend, [sentence], [temp_path]))
+                    if len(segment_futures) == 1:
+                        segment_futures[0].add_done_callback(lambda f: print(
+                            f"DEBUG: First voiceover sentence ready after {time.perf_counter() - started:.2f}s"))
+                segment_paths = [future.result()[0] for future in segment_futures]
+        durations = [audio_duration(segment_path) for segment_path in segment_paths]
+        join_audio_segments(segment_paths, audio_path)
+        save_voiceover_segments(audio_path, texts, durations)
+    finally:
+        shutil.rmtree(segment_folder, ignore_errors=True)
+    evict_tts_cache()
+    print_tts_cache_stats()
+    return texts
+
+
+def voiceover_path_for(topic, backend):
+    return os.path.join(AUDIO_OUTPUT, f"{topic}{backend.extension}")
+
+
+# Function to generate the voiceover while the script is still streaming in, returns (script, audio_path)
+def generate_voiceover_streaming(topic):
+    started = time.perf_counter()
+    backend = get_tts_backend()
+    audio_path = voiceover_path_for(topic, backend)
+    script = " ".join(synthesize_voiceover(stream_script_sentences(topic), audio_path, backend))
+    print(f"DEBUG: Full script converted to voiceover:\n{script}")
+    print(f"DEBUG: Voiceover for {topic} has been successfully generated in {time.perf_counter() - started:.2f}s!")
+    return script, audio_path
+
+
+# Function to query Pexels and parse the result into [{"id", "duration", "files": [{"link", "width", "height", "fps"}]}]
+def query_pexels_videos(query, api_key, it, min_dur):
+    import requests
     headers = {"Authorization": api_key}
-    qurl = f"https://api.pexels.com/videos/search?query={query}&per_page={it}"
-    r = requests.get(qurl, headers=headers)
+    r = requests.get("https://api.pexels.com/videos/search", params={"query": query, "per_page": it},
+                     headers=headers, timeout=DOWNLOAD_TIMEOUT)
+    r.raise_for_status()
     response = r.json()
+    videos = []
+    for video in response["videos"][:it]:
+        if video["duration"] < min_dur:
+            continue
+        files = [{"link": video_file["link"], "width": video_file.get("width") or 0,
+                  "height": video_file.get("height") or 0, "fps": video_file.get("fps") or 0}
+                 for video_file in video["video_files"] if ".com/video-files" in video_file["link"]]
+        if files:
+            videos.append({"id": video["id"], "duration": video["duration"], "files": files})
+    return videos
+
+
+def search_cache_connection():
+    db_path = SEARCH_CACHE_DB or os.path.join(DOWNLOADED_VIDEO_FOLDER, "pexels_search.sqlite3")
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=30)
+    connection.execute("CREATE TABLE IF NOT EXISTS search_cache "
+                       "(cache_key TEXT PRIMARY KEY, created REAL NOT NULL, results TEXT NOT NULL)")
+    return connection
+
+
+def store_search_results(cache_key, videos):
+    with closing(search_cache_connection()) as connection, connection:
+        connection.execute("INSERT OR REPLACE INTO search_cache (cache_key, created, results) VALUES (?, ?, ?)",
+                           (cache_key, time.time(), json.dumps(videos)))
+
+
+def refresh_search_cache(cache_key, query, api_key, it, min_dur):
+    try:
+        store_search_results(cache_key, query_pexels_videos(query, api_key, it, min_dur))
+        print(f"DEBUG: Refreshed cached Pexels search for \"{query}\"")
+    except Exception as e:
+        print(f"{fg('yellow')}Background refresh of Pexels search \"{query}\" failed: {e}{attr('reset')}")
+    finally:
+        with search_refresh_lock:
+            search_refreshes.discard(cache_key)
+
+
+# Function to search Pexels through the SQLite search cache
+# Fresh results (younger than PEXELS_SEARCH_TTL) are returned as they are, stale ones (up to PEXELS_SEARCH_STALE
+# seconds past the TTL) are returned straight away while a background thread fetches new results for next time
+def cached_pexels_search(query, api_key, it, min_dur):
+    cache_key = json.dumps([normalize_topic(query), it, min_dur])
+    with closing(search_cache_connection()) as connection:
+        row = connection.execute("SELECT created, results FROM search_cache WHERE cache_key = ?", (cache_key,)).fetchone()
+    if row:
+        age = time.time() - row[0]
+        if age < PEXELS_SEARCH_TTL:
+            return json.loads(row[1])
+        if age < PEXELS_SEARCH_TTL + PEXELS_SEARCH_STALE:
+            with search_refresh_lock:
+                start_refresh = cache_key not in search_refreshes
+                search_refreshes.add(cache_key)
+            if start_refresh:
+                threading.Thread(target=refresh_search_cache, args=(cache_key, query, api_key, it, min_dur),
+                                 daemon=True).start()
+            return json.loads(row[1])
+    try:
+        videos = query_pexels_videos(query, api_key, it, min_dur)
+    except Exception:
+        if row:  # too old to trust normally, but better than nothing when Pexels is down
+            print(f"{fg('yellow')}Pexels search failed, using expired cached results for \"{query}\"{attr('reset')}")
+            return json.loads(row[1])
+        raise
+    store_search_results(cache_key, videos)
+    return videos
+
+
+# Function to pick the smallest rendition whose 9:16 crop window still covers the output size at the output fps
+# Falls back to the rendition with the biggest crop window when none of them is big enough
+def select_rendition(files, target_width=None, target_height=None, target_fps=None):
+    target_width = target_width or TARGET_WIDTH
+    target_height = target_height or TARGET_HEIGHT
+    target_fps = target_fps or TARGET_FPS
+
+    def crop_window(video_file):
+        width, height = video_file["width"], video_file["height"]
+        if width * target_height > height * target_width:  # wider than the target, the sides get cropped
+            return height * target_width / target_height, height
+        return width, width * target_height / target_width
+
+    def covers_target(video_file):
+        crop_width, crop_height = crop_window(video_file)
+        return (crop_width >= target_width * RENDITION_MIN_SCALE
+                and crop_height >= target_height * RENDITION_MIN_SCALE)
+
+    def fast_enough(video_file):
+        return not video_file["fps"] or video_file["fps"] >= target_fps - 0.5  # 23.976 counts as 24
+
+    def pixels(video_file):
+        return video_file["width"] * video_file["height"], video_file["fps"] or 0
+
+    covering = [video_file for video_file in files if covers_target(video_file)]
+    if covering:
+        return min([video_file for video_file in covering if fast_enough(video_file)] or covering, key=pixels)
+    return max(files, key=lambda video_file: (crop_window(video_file)[1], video_file["fps"] or 0))
+
+
+# Function to fetch stock videos
+def search_for_stock_videos(query: str, api_key: str, it: int, min_dur: int) -> List[str]:
     video_url = []
     try:
-        for i in range(it):
-            if response["videos"][i]["duration"] < min_dur:
-                continue
-            raw_urls = response["videos"][i]["video_files"]
-            temp_video_url = ""
-            video_res = 0
-            for video in raw_urls:
-                if ".com/video-files" in video["link"] and (video["width"] * video["height"]) > video_res:
-                    temp_video_url = video["link"]
-                    video_res = video["width"] * video["height"]
-            if temp_video_url:
-                video_url.append(temp_video_url)
+        for video in cached_pexels_search(query, api_key, it, min_dur):
+            video_url.append(select_rendition(video["files"])["link"])
     except Exception as e:
         print(f"{fg('red')}[-] No Videos found.{attr('reset')}")
         print(f"{fg('red')}{e}{attr('reset')}")
@@ -152,27 +933,123 @@ def sanitize_filename(filename: str) -> str:
     return re.sub(r'[^\w\s-]', '', filename).strip().replace(' ', '_')
 
 
+# Function to download a file with retries, resuming a dropped connection with an HTTP Range request
+# Data goes to path + ".part" and is only renamed to path once complete
+def download_file(url, path):
+    import requests
+    partial_path = f"{path}.part"
+    for attempt in range(1, DOWNLOAD_RETRIES + 1):
+        resume_from = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        headers = {"Range": f"bytes={resume_from}-"} if resume_from else {}
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                if response.status_code == 416:  # nothing left to fetch, the partial file is already complete
+                    os.replace(partial_path, path)
+                    return True
+                response.raise_for_status()
+                if response.status_code == 206:
+                    expected_size = int(response.headers.get("Content-Range", "*/0").rsplit("/", 1)[-1] or 0)
+                    mode = "ab"
+                else:  # 200 means the server ignored the Range header, so start again from zero
+                    expected_size = int(response.headers.get("Content-Length", 0))
+                    mode = "wb"
+                with open(partial_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        if chunk:
+                            f.write(chunk)
+            if expected_size and os.path.getsize(partial_path) < expected_size:
+                raise IOError(f"connection closed at {os.path.getsize(partial_path)} of {expected_size} bytes")
+            os.replace(partial_path, path)
+            return True
+        except (requests.RequestException, IOError, ValueError) as e:
+            print(f"{fg('yellow')}Download attempt {attempt}/{DOWNLOAD_RETRIES} failed for {os.path.basename(path)}: {e}{attr('reset')}")
+            if attempt < DOWNLOAD_RETRIES:
+                time.sleep(min(2 ** attempt, 10))
+    return False
+
+
+def stock_library_folder():
+    return STOCK_LIBRARY_FOLDER or os.path.join(DOWNLOADED_VIDEO_FOLDER, "library")
+
+
+# Function to name a clip in the library by its Pexels video ID and rendition,
+# e.g. .../video-files/3195394/3195394-uhd_2560_1440_25fps.mp4 -> 3195394-uhd_2560_1440_25fps.mp4
+def pexels_library_name(video_url):
+    match = re.search(r"/video-files/(\d+)/([^/?#]+)", video_url)
+    if not match:
+        return hashlib.sha256(video_url.encode("utf-8")).hexdigest()[:20] + ".mp4"
+    video_id, rendition = match.groups()
+    return rendition if rendition.startswith(video_id) else f"{video_id}_{rendition}"
+
+
+def library_lock(library_path):
+    # Two topics can ask for the same clip at once, only one of them should download it
+    with library_locks_guard:
+        return library_locks.setdefault(library_path, threading.Lock())
+
+
+# Function to get a Pexels clip through the local library, it is only downloaded if the library does not have it yet
+# Returns the library path (shared by every topic that uses the clip) or None if the download failed
 def download_video_from_pexels(topic, video_index, video_url):
-    if not os.path.exists(DOWNLOADED_VIDEO_FOLDER):
-        os.makedirs(DOWNLOADED_VIDEO_FOLDER)
+    os.makedirs(stock_library_folder(), exist_ok=True)
+    library_name = pexels_library_name(video_url)
+    library_path = os.path.join(stock_library_folder(), library_name)
+
+    with library_lock(library_path):
+        if os.path.exists(library_path):
+            os.utime(library_path)  # mark as recently used for the LRU eviction
+            print(f"Video {topic}{video_index:03d} found in library as {library_name}.")
+            return library_path
+        if download_file(video_url, library_path):
+            print(f"Video {topic}{video_index:03d} downloaded successfully as {library_name}.")
+            return library_path
+    print(f"Failed to download video {topic}{video_index:03d}.")
+    return None
+
+
+# Function to drop the least recently used library clips and proxies until together they fit in
+# STOCK_LIBRARY_MAX_BYTES - proxies are touched on every use, so a proxy still in use outlives its source clip
+# Clips pinned with pin_clips (fetched for topics that are not rendered yet) are never dropped
+def evict_stock_library():
+    with pinned_clips_lock:
+        keep = set().union(*pinned_clips.values())
+    with eviction_lock:
+        entries = []
+        for folder in (stock_library_folder(), proxy_folder()):
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                if name.endswith(".mp4") and ".part" not in name:
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        total_bytes = sum(size for mtime, size, path in entries)
+        for mtime, size, path in sorted(entries):
+            if total_bytes <= STOCK_LIBRARY_MAX_BYTES:
+                break
+            if os.path.abspath(path) in keep:
+                continue
+            try:
+                with library_lock(path):
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            print(f"DEBUG: Removed {os.path.basename(path)} from the stock video library")
 
-    video_filename = f"{topic}{video_index:03d}.mp4"
-    down_fold_video_path = os.path.join(DOWNLOADED_VIDEO_FOLDER, video_filename)
 
-    try:
-        response = requests.get(video_url, stream=True)
-        if response.status_code == 200:
-            with open(down_fold_video_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk:
-                        f.write(chunk)
-            print(f"Video {video_filename} downloaded successfully.")
-        else:
-            print(f"Failed to download video {video_filename}. Status code: {response.status_code}")
-    except Exception as e:
-        print(f"Error downloading video {video_filename}: {e}")
+# Functions to keep a topic's clips out of evict_stock_library until it has been rendered
+def pin_clips(topic, paths):
+    with pinned_clips_lock:
+        pinned_clips.setdefault(topic, set()).update(os.path.abspath(path) for path in paths)
+
 
-    return down_fold_video_path
+def unpin_clips(topic):
+    with pinned_clips_lock:
+        pinned_clips.pop(topic, None)
 
 
 def fetch_stock_videos(keywords, topic):
@@ -180,29 +1057,88 @@ def fetch_stock_videos(keywords, topic):
     api_key = os.getenv("STOCK_VIDEO_API_KEY")
     videos = search_for_stock_videos(" ".join(keywords), api_key, 5, 10)
 
-    DOWNLOADED_VIDEO_FOLDER = os.getenv("DOWNLOADED_VIDEO_FOLDER")
-    download_paths = []
-
-    for idx, video_url in enumerate(videos):
-        download_path = download_video_from_pexels(topic, idx, video_url)
-        download_paths.append(download_path)
+    # Download all clips at once, so the fetch takes about as long as the slowest clip
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+        download_paths = list(executor.map(download_video_from_pexels, [topic] * len(videos), range(len(videos)), videos))
+    download_paths = [download_path for download_path in download_paths if download_path]
+    pin_clips(topic, download_paths)
+    evict_stock_library()
     return download_paths
 
-def generate_subtitles(script, topic):
-    sentences = sent_tokenize(script)  # Split script into sentences
+# Function to read a voiceover as mono float PCM through ffmpeg
+def voiceover_pcm(audio_path, sample_rate):
+    import numpy as np
+    result = subprocess.run([ffmpeg_binary(), "-v", "error", "-i", audio_path, "-f", "s16le", "-ac", "1",
+                             "-ar", str(sample_rate), "-"], capture_output=True, check=True)
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+# Function to time sentences from the voiceover itself - finds the pauses with a frame energy analysis, then moves
+# each sentence boundary (first guessed from sentence length) onto the nearest pause
+# Returns [(start, end), ...] in seconds, or None if the audio has no speech in it
+def timings_from_audio(sentences, audio_path):
+    import numpy as np
+    frame_size = 160  # 10 ms at 16 kHz
+    samples = voiceover_pcm(audio_path, 16000)
+    frame_count = len(samples) // frame_size
+    if frame_count == 0:
+        return None
+    energy = np.sqrt(np.mean(samples[:frame_count * frame_size].reshape(frame_count, frame_size) ** 2, axis=1))
+    silent = energy < energy.max() * SILENCE_THRESHOLD
+    voiced = np.flatnonzero(~silent)
+    if voiced.size == 0:
+        return None
+    speech_start, speech_end = voiced[0], voiced[-1] + 1
+
+    # Runs of silent frames long enough to be a pause between sentences
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    run_starts, run_ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    is_pause = (run_ends - run_starts >= MIN_PAUSE_FRAMES) & (run_starts > speech_start) & (run_ends < speech_end)
+    pause_centres = (run_starts[is_pause] + run_ends[is_pause]) / 2
+
+    # First guess: the speech is shared between sentences by their length in characters
+    lengths = np.array([len(sentence) for sentence in sentences], dtype=np.float64)
+    guesses = speech_start + (speech_end - speech_start) * np.cumsum(lengths)[:-1] / lengths.sum()
+
+    boundaries = [speech_start]
+    for guess in guesses:
+        candidates = pause_centres[(pause_centres > boundaries[-1]) & (np.abs(pause_centres - guess) <= PAUSE_SNAP_FRAMES)]
+        boundaries.append(candidates[np.abs(candidates - guess).argmin()] if candidates.size else max(guess, boundaries[-1]))
+    boundaries.append(speech_end)
+    seconds = np.array(boundaries, dtype=np.float64) * frame_size / 16000
+    return list(zip(seconds[:-1].tolist(), seconds[1:].tolist()))
+
+
+# Function to work out when each sentence is spoken - from the per-sentence voiceover durations when they were
+# recorded, otherwise from the voiceover audio, and only as a last resort a fixed time per sentence
+def subtitle_timings(sentences, voiceover_path=None):
+    if voiceover_path:
+        segments = load_voiceover_segments(voiceover_path)
+        if segments and len(segments) == len(sentences):
+            return [(segment["start"], segment["start"] + segment["duration"]) for segment in segments]
+        try:
+            timings = timings_from_audio(sentences, voiceover_path)
+            if timings:
+                return timings
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"{fg('yellow')}Could not analyse the voiceover for subtitle timing: {e}{attr('reset')}")
     time_per_sentence = 1.5  # Adjust time per sentence as needed
-    total_duration = len(sentences) * time_per_sentence
+    return [(index * time_per_sentence, (index + 1) * time_per_sentence) for index in range(len(sentences))]
+
 
-    # Create subtitles for each sentence
+def generate_subtitles(script, topic, voiceover_path=None):
+    import srt
+    from nltk.tokenize import sent_tokenize
+    sentences = sent_tokenize(script)  # Split script into sentences
+
+    # Create subtitles for each sentence, timed to the voiceover
     subs = []
-    current_time = timedelta(seconds=0)
-    for sentence in sentences:
+    for sentence, (start, end) in zip(sentences, subtitle_timings(sentences, voiceover_path)):
         subtitle = srt.Subtitle(index=len(subs) + 1,
-                                start=current_time,
-                                end=current_time + timedelta(seconds=time_per_sentence),
+                                start=timedelta(seconds=start),
+                                end=timedelta(seconds=end),
                                 content=sentence)
         subs.append(subtitle)
-        current_time += timedelta(seconds=time_per_sentence)
 
     # Ensure subtitle output folder exists
     if not os.path.exists(SUBTITLE_OUTPUT_FOLDER):
@@ -212,69 +1148,724 @@ def generate_subtitles(script, topic):
     subtitle_filename = os.path.join(SUBTITLE_OUTPUT_FOLDER, f"{topic}.srt")
 
     # Write subtitles to file
-    with open(subtitle_filename, "w") as subtitle_file:
-        subtitle_file.write(srt.compose(subs))
+    atomic_write_text(subtitle_filename, srt.compose(subs))
+
+    # Same subtitles, styled, for the libass burn-in
+    write_ass_subtitles(subs, ass_subtitle_path(subtitle_filename))
 
     print(f"DEBUG: Subtitles saved as: {subtitle_filename}.")
     return subtitle_filename
 
 
+def ass_subtitle_path(subtitle_path):
+    return os.path.splitext(subtitle_path)[0] + ".ass"
+
+
+def subtitle_font_name():
+    return SUBTITLE_FONT_NAME or os.path.splitext(os.path.basename(SUBTITLE_FONT))[0]
+
+
+def ass_timestamp(delta):
+    centiseconds = int(round(delta.total_seconds() * 100))
+    return f"{centiseconds // 360000}:{centiseconds // 6000 % 60:02d}:{centiseconds // 100 % 60:02d}.{centiseconds % 100:02d}"
+
+
+# Function to write the subtitles as an ASS file styled like the TextClip subtitles - yellow with a black outline,
+# centred, 80% of the video width, bottom of the text at 95% of the height. The canvas is the output size,
+# so font size and outline are in output pixels
+def write_ass_subtitles(subs, ass_path):
+    margin_side = int(TARGET_WIDTH * 0.1)
+    margin_bottom = int(TARGET_HEIGHT * 0.05)
+    primary = ass_color(SUBTITLE_COLOR)
+    outline = ass_color(SUBTITLE_STROKE_COLOR)
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {TARGET_WIDTH}",
+        f"PlayResY: {TARGET_HEIGHT}",
+        "WrapStyle: 0",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, "
+        "Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, "
+        "MarginL, MarginR, MarginV, Encoding",
+        f"Style: Default,{subtitle_font_name()},{SUBTITLE_FONT_SIZE},{primary},{primary},{outline},&H00000000,"
+        f"0,0,0,0,100,100,0,0,1,{SUBTITLE_STROKE_WIDTH},0,2,{margin_side},{margin_side},{margin_bottom},1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    for subtitle in subs:
+        # Braces would start an ASS override block, line breaks are written as \N
+        text = subtitle.content.replace("{", "(").replace("}", ")").replace("\n", "\\N")
+        lines.append(f"Dialogue: 0,{ass_timestamp(subtitle.start)},{ass_timestamp(subtitle.end)},Default,,0,0,0,,{text}")
+    atomic_write_text(ass_path, "\n".join(lines) + "\n")
+
+
+
+
+# Function to rasterize a subtitle once - returns (premultiplied RGB, alpha) uint8 arrays
+# Sprites are cached by everything that changes how the text looks, so repeated lines are only drawn once
+def subtitle_sprite(text, font_path, font_size, color, stroke_color, stroke_width, width):
+    key = (text, font_path, font_size, color, stroke_color, stroke_width, width)
+    with subtitle_sprites_lock:
+        if key in subtitle_sprites:
+            subtitle_sprites.move_to_end(key)
+            return subtitle_sprites[key]
+    import numpy as np
+    from moviepy import TextClip
+    text_clip = TextClip(
+        text=text,
+        font=font_path,
+        font_size=font_size,
+        color=color,
+        stroke_color=stroke_color,
+        stroke_width=stroke_width,
+        method="caption",  # Use caption method for text wrapping
+        size=(width, None),  # auto height
+        text_align="center",
+        horizontal_align="center",  # Center text horizontally
+        vertical_align="center",
+    )
+    alpha = text_clip.mask.get_frame(0).astype(np.float32)[:, :, None]
+    premultiplied = text_clip.get_frame(0).astype(np.float32) * alpha
+    sprite = (np.rint(premultiplied).astype(np.uint8), np.rint(alpha * 255).astype(np.uint8))
+    text_clip.close()
+    with subtitle_sprites_lock:
+        subtitle_sprites[key] = sprite
+        while len(subtitle_sprites) > SUBTITLE_SPRITE_CACHE_SIZE:
+            subtitle_sprites.popitem(last=False)
+    return sprite
+
+
+# Draws the subtitles of an SRT file onto video frames. Each subtitle is a cached sprite that is alpha blended
+# (vectorized, NumPy) onto only the frames inside its time window, found with a binary search over the start times
+# offset/duration limit the subtitles to one window of the video (for chunked rendering), timed from its start
+class SubtitleOverlay:
+    def __init__(self, subtitle_path, video_size, font_path=None, font_size=None, color=None, stroke_width=None,
+                 stroke_color=None, offset=0.0, duration=None):
+        import srt
+        font_path = font_path or SUBTITLE_FONT
+        font_size = font_size or SUBTITLE_FONT_SIZE
+        color = color or SUBTITLE_COLOR
+        stroke_width = SUBTITLE_STROKE_WIDTH if stroke_width is None else stroke_width
+        stroke_color = stroke_color or SUBTITLE_STROKE_COLOR
+
+        # Read and parse subtitles
+        with open(subtitle_path, 'r', encoding='utf-8') as f:  # generate_subtitles writes UTF-8
+            subtitles = list(srt.parse(f.read()))  # Parse SRT file
+
+        print(f"DEBUG: Parsed {len(subtitles)} subtitles")
+
+        # Get video dimensions and ensure they're integers
+        img_width, img_height = map(int, video_size)  # Casting to integers
+
+        window_end = float("inf") if duration is None else duration
+        self.entries = []
+        for subtitle in subtitles:
+            start_time = max(0.0, subtitle.start.total_seconds() - offset)
+            end_time = min(window_end, subtitle.end.total_seconds() - offset)
+            if end_time <= start_time:
+                continue  # outside this window
+            # 80% of video width, centred, bottom of the text at 95% of the height like the ASS style
+            premultiplied, alpha = subtitle_sprite(subtitle.content, font_path, font_size, color, stroke_color,
+                                                   stroke_width, int(img_width * 0.8))
+            x = (img_width - premultiplied.shape[1]) // 2
+            y = max(0, int(img_height * 0.95) - premultiplied.shape[0])
+            # Only the part of the sprite that lands inside the frame is blended
+            visible_height = min(premultiplied.shape[0], img_height - y)
+            visible_width = min(premultiplied.shape[1], img_width - x)
+            if visible_height <= 0 or visible_width <= 0:
+                continue
+            self.entries.append((start_time, end_time, x, y, premultiplied[:visible_height, :visible_width],
+                                 alpha[:visible_height, :visible_width]))
+        self.entries.sort(key=lambda entry: entry[0])
+        self.starts = [entry[0] for entry in self.entries]
+
+    # The subtitle showing at time t, or None - subtitles are sequential, so only the last one started can be showing
+    def active(self, t):
+        index = bisect.bisect_right(self.starts, t) - 1
+        if index >= 0 and t < self.entries[index][1]:
+            return self.entries[index]
+        return None
+
+    # moviepy transform - blends the active subtitle onto the frame at time t
+    def blend(self, get_frame, t):
+        import numpy as np
+        frame = get_frame(t)
+        entry = self.active(t)
+        if entry is None:
+            return frame
+        start_time, end_time, x, y, premultiplied, alpha = entry
+        height, width = alpha.shape[:2]
+        frame = frame.copy()
+        region = frame[y:y + height, x:x + width].astype(np.float32)
+        blended = premultiplied + region * (1.0 - alpha.astype(np.float32) / 255.0)
+        frame[y:y + height, x:x + width] = np.rint(np.minimum(blended, 255.0)).astype(np.uint8)
+        return frame
+
+    def apply(self, video_clip):
+        return video_clip.transform(self.blend)
+
+
+# Function to burn subtitles into an already rendered video (second encode) - the main render draws them in one pass
+def add_subtitles_to_video(video_path, subtitle_path, output_path, font_path=None,
+                           font_size=None, color=None, stroke_width=None, stroke_color=None):
+    with ClipPool() as pool:
+        # Load the video
+        video_clip = pool.video(video_path)
+
+        # Overlay subtitles on the video
+        overlay = SubtitleOverlay(subtitle_path, video_clip.size, font_path, font_size, color, stroke_width,
+                                  stroke_color, duration=video_clip.duration)
+        final_video = overlay.apply(video_clip)
+
+        # Export the final video
+        final_video.write_videofile(output_path, codec="libx264", audio_codec="aac", fps=video_clip.fps)
 
+    print(f"DEBUG: Video with subtitles saved as: {output_path}")
 
-def add_subtitles_to_video(video_path, subtitle_path, output_path, font_path='C:/Windows/Fonts/arial.ttf',
-                           font_size=32, color='yellow', stroke_width=2, stroke_color='black'):
-    # Load the video
-    video_clip = VideoFileClip(video_path)
 
-    # Read and parse subtitles
-    with open(subtitle_path, 'r', encoding='latin-1') as f:
-        subtitles = list(srt.parse(f.read()))  # Parse SRT file
+def parse_frame_rate(rate):
+    numerator, _, denominator = (rate or "0/1").partition("/")
+    return float(numerator) / float(denominator or 1) if float(denominator or 1) else 0.0
+
+
+# Function to read duration, size, frame rate and codec from the container metadata, without opening a decoder
+# Uses ffprobe when it is installed, otherwise the header parsing moviepy does with its own ffmpeg
+def probe_media(path):
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    if memo_key in media_probes:
+        return media_probes[memo_key]
+
+    ffprobe = FFPROBE_BINARY or shutil.which("ffprobe")
+    if ffprobe:
+        result = subprocess.run([ffprobe, "-v", "error", "-of", "json", "-show_entries",
+                                 "format=duration:stream=codec_type,codec_name,width,height,avg_frame_rate,"
+                                 "r_frame_rate,pix_fmt,duration", path],
+                                capture_output=True, text=True, check=True)
+        probe = json.loads(result.stdout)
+        streams = probe.get("streams", [])
+        video = next((stream for stream in streams if stream.get("codec_type") == "video"), {})
+        info = {
+            "duration": float(video.get("duration") or probe.get("format", {}).get("duration") or 0),
+            "width": video.get("width"),
+            "height": video.get("height"),
+            "fps": parse_frame_rate(video.get("avg_frame_rate")) or parse_frame_rate(video.get("r_frame_rate")),
+            "video_codec": video.get("codec_name"),
+            "pix_fmt": video.get("pix_fmt"),
+            "has_audio": any(stream.get("codec_type") == "audio" for stream in streams),
+        }
+    else:
+        from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+        infos = ffmpeg_parse_infos(path)
+        width, height = infos.get("video_size") or (None, None)
+        info = {"duration": infos.get("duration") or 0, "width": width, "height": height,
+                "fps": infos.get("video_fps") or 0, "video_codec": infos.get("video_codec_name"),
+                "pix_fmt": None, "has_audio": infos.get("audio_found", False)}
+    media_probes[memo_key] = info
+    return info
+
+
+# Function to plan the footage from metadata alone - returns the edit list [(video path, in, out), ...] covering
+# target_duration, and how long the last frame has to be held if the whole library is shorter than that
+def plan_edit_list(video_paths, target_duration):
+    edit_list = []
+    planned_duration = 0.0
+    for video_path in video_paths:
+        remaining = target_duration - planned_duration
+        if remaining <= 0.001:
+            break
+        try:
+            clip_duration = probe_media(video_path)["duration"]
+        except (OSError, ValueError, subprocess.CalledProcessError) as e:
+            print(f"{fg('yellow')}Skipping {video_path}, could not read it: {e}{attr('reset')}")
+            continue
+        if clip_duration <= 0:
+            continue
+        take = min(clip_duration, remaining)
+        edit_list.append((video_path, 0.0, round(take, 3)))
+        planned_duration += round(take, 3)
+    if not edit_list:
+        raise RuntimeError("No usable stock footage to build the video from")
+    freeze_duration = max(0.0, round(target_duration - planned_duration, 3))
+    return edit_list, freeze_duration
+
+
+# Opens every source file once, hands the same reader to every segment cut from it and closes them all at the end,
+# so no ffmpeg reader process or frame buffer outlives the render
+class ClipPool:
+    def __init__(self):
+        self.clips = {}
+
+    def video(self, path):
+        if ("video", path) not in self.clips:
+            from moviepy import VideoFileClip
+            self.clips[("video", path)] = VideoFileClip(path)
+        return self.clips[("video", path)]
+
+    def audio(self, path):
+        if ("audio", path) not in self.clips:
+            from moviepy import AudioFileClip
+            self.clips[("audio", path)] = AudioFileClip(path)
+        return self.clips[("audio", path)]
+
+    def close(self):
+        for clip in self.clips.values():
+            clip.close()
+        self.clips.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Function to centre-crop a clip to the output aspect ratio and scale it to exactly the output size, like
+# crop_scale_filter, so every clip (and every parallel render chunk) comes out the same size whatever its source
+def fit_clip_to_target(clip):
+    width, height = clip.size
+    crop_width = min(width, height * TARGET_WIDTH / TARGET_HEIGHT)
+    crop_height = min(height, width * TARGET_HEIGHT / TARGET_WIDTH)
+    if (crop_width, crop_height) != (width, height):
+        clip = clip.cropped(x_center=width / 2, y_center=height / 2, width=int(crop_width), height=int(crop_height))
+    if tuple(clip.size) != (TARGET_WIDTH, TARGET_HEIGHT):
+        clip = clip.resized((TARGET_WIDTH, TARGET_HEIGHT))
+    return clip
+
+
+# Function to build the moviepy timeline - returns (video without subtitles, video with subtitles composed on top)
+# edit_list is a list of (video path, in point, out point) from plan_edit_list, only those ranges are decoded
+# subtitle_offset is where this timeline starts in the full video, for rendering one chunk of it
+def build_moviepy_timeline(pool, edit_list, freeze_duration, subtitle_path, subtitle_offset=0.0):
+    from moviepy import concatenate_videoclips
+    from moviepy.video.fx import Freeze
+    # Crop or resize every clip to vertical (9:16) at the output size before they are joined
+    video_clips = [fit_clip_to_target(pool.video(video_path).subclipped(start, end))
+                   for video_path, start, end in edit_list]
+
+    # Concatenate all video clips to match the voiceover duration
+    final_video_clip = concatenate_videoclips(video_clips)
 
-    print(f"DEBUG: Parsed {len(subtitles)} subtitles")
+    if freeze_duration > 0:
+        # The library ran short - extend the last clip by holding the last frame until the voiceover is finished
+        last_clip = video_clips[-1]
+        remaining_duration = freeze_duration
+        extended_clip = last_clip.subclipped(max(0, last_clip.duration - 1),
+                                             last_clip.duration)  # Get the last second of the last clip
 
-    # Store subtitle clips
-    subtitle_clips = []
+        # Freeze this last frame
+        # Instantiate the Freeze effect with the correct parameters
+        freeze_effect = Freeze(t=extended_clip.duration, freeze_duration=remaining_duration)
 
-    # Get video dimensions and ensure they're integers
-    img_width, img_height = map(int, video_clip.size)  # Casting to integers
+        # Apply the freeze effect to the extended clip
+        extended_clip = freeze_effect.apply(extended_clip)
 
-    for subtitle in subtitles:
-        start_time = subtitle.start.total_seconds()
-        end_time = subtitle.end.total_seconds()
-        duration = end_time - start_time
+        # Set the duration of the extended clip to match the remaining duration
+        extended_clip = extended_clip.with_duration(remaining_duration)
 
-        # Create TextClip for each subtitle
-        text_clip = TextClip(
-            text=subtitle.content,
-            font=font_path,
-            font_size=font_size,
-            color=color,
-            stroke_color=stroke_color,
-            stroke_width=stroke_width,
-            method="caption",  # Use caption method for text wrapping
-            size=(int(img_width * 0.8), None),  # 80% of video width, auto height, cast to int
-            text_align="center",
-            horizontal_align="center",  # Center text horizontally
-            vertical_align="center",    # Align text to the bottom
-        )
+        # Add FX composition with the extended clip
+        final_video_clip = concatenate_videoclips(video_clips + [extended_clip])
 
-        # Position the text at the bottom (95% of height)
-        text_clip = text_clip.with_position(("center", 0.95), relative=True) \
-                             .with_start(start_time) \
-                             .with_duration(duration)
+    if not subtitle_path:
+        return final_video_clip, final_video_clip
+
+    # Draw the subtitles in the same timeline, so the video is decoded and encoded only once
+    overlay = SubtitleOverlay(subtitle_path, final_video_clip.size, offset=subtitle_offset,
+                              duration=final_video_clip.duration)
+    return final_video_clip, overlay.apply(final_video_clip)
+
+
+# Function to render the timeline with moviepy, compositing every frame in Python
+def render_with_moviepy(edit_list, freeze_duration, voiceover_path, subtitle_path, output_path):
+    with ClipPool() as pool:
+        final_video_clip, final_video = build_moviepy_timeline(pool, edit_list, freeze_duration, subtitle_path)
+        voiceover = pool.audio(voiceover_path)
+        final_video.with_audio(voiceover).write_videofile(output_path, codec="libx264", audio_codec="aac",
+                                                          fps=TARGET_FPS)
+
+
+def ffmpeg_binary():
+    from moviepy.config import FFMPEG_BINARY  # the ffmpeg moviepy uses (imageio-ffmpeg's unless overridden)
+    return FFMPEG_BINARY
+
+
+def run_ffmpeg(args):
+    command = [ffmpeg_binary(), "-hide_banner", "-y", "-loglevel", "error", "-stats"] + [str(arg) for arg in args]
+    print(f"DEBUG: Running {' '.join(command)}")
+    subprocess.run(command, check=True)
+
+
+# Function to escape a value for use as a filter option inside an ffmpeg filtergraph
+# It is unescaped twice, once by the filtergraph parser and once by the filter's option parser
+def ffmpeg_filter_value(value):
+    for special in "\\':":
+        value = value.replace(special, "\\" + special)
+    for special in "\\'[],;":
+        value = value.replace(special, "\\" + special)
+    return value
+
+
+# Function to turn a colour into the &HAABBGGRR form libass uses - colours are resolved by PIL like TextClip does, so
+# any colour the moviepy engine accepts (names such as gold, #RGB, #RRGGBB, rgb(...)) means the same here
+def ass_color(color):
+    from PIL import ImageColor
+    if re.fullmatch(r"[0-9A-Fa-f]{6}", color):
+        color = f"#{color}"  # bare hex was accepted before
+    red, green, blue = ImageColor.getrgb(color)[:3]  # ValueError for colours PIL does not know either
+    return f"&H00{blue:02X}{green:02X}{red:02X}"
+
+
+# Function to build the libass style matching the TextClip subtitles (font, size, colours, bottom centre, 80% width)
+# libass lays SRT subtitles out on a 384x288 canvas, so pixel sizes are scaled down to it
+def srt_force_style(output_height):
+    scale = 288 / output_height
+    return ",".join([
+        f"FontName={subtitle_font_name()}",
+        f"FontSize={SUBTITLE_FONT_SIZE * scale:.2f}",
+        f"PrimaryColour={ass_color(SUBTITLE_COLOR)}",
+        f"OutlineColour={ass_color(SUBTITLE_STROKE_COLOR)}",
+        "BorderStyle=1",
+        f"Outline={SUBTITLE_STROKE_WIDTH * scale:.2f}",
+        "Shadow=0",
+        "Alignment=2",
+        "MarginL=38",
+        "MarginR=38",
+        "MarginV=14",
+    ])
+
+
+# Function to build the subtitle burn-in filter - the styled ASS file written next to the SRT goes straight to
+# libass, an SRT without one is styled through force_style
+def subtitle_filter(subtitle_path):
+    ass_path = ass_subtitle_path(subtitle_path)
+    if os.path.exists(ass_path):
+        options = [f"filename={ffmpeg_filter_value(os.path.abspath(ass_path).replace(os.sep, '/'))}"]
+        filter_name = "ass"
+    else:
+        options = [f"filename={ffmpeg_filter_value(os.path.abspath(subtitle_path).replace(os.sep, '/'))}",
+                   f"force_style={ffmpeg_filter_value(srt_force_style(TARGET_HEIGHT))}"]
+        filter_name = "subtitles"
+    if os.path.isfile(SUBTITLE_FONT):
+        options.append(f"fontsdir={ffmpeg_filter_value(os.path.dirname(os.path.abspath(SUBTITLE_FONT)).replace(os.sep, '/'))}")
+    return f"{filter_name}=" + ":".join(options)
+
+
+# Function to build the filter chain that centre-crops a clip to the output aspect ratio and scales it to size
+def crop_scale_filter(width, height, fps):
+    return (f"crop=w=trunc(min(iw\\,ih*{width}/{height})/2)*2:h=trunc(min(ih\\,iw*{height}/{width})/2)*2,"
+            f"scale={width}:{height},fps={fps},setsar=1,format=yuv420p")
+
+
+def proxy_folder():
+    return PROXY_FOLDER or os.path.join(DOWNLOADED_VIDEO_FOLDER, "proxies")
+
+
+# Function to hash a file's content, remembered per (path, size, mtime) so a clip is only read once per run
+def file_hash(path):
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    if memo_key not in file_hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+                digest.update(block)
+        file_hashes[memo_key] = digest.hexdigest()
+    return file_hashes[memo_key]
+
+
+# Function to transcode a clip once into a cropped, output-sized, constant-frame-rate proxy that is cheap to decode
+# Proxies are cached by source hash and output size, so every later render using the clip reuses the same file
+def normalize_clip(video_path):
+    proxy_name = f"{file_hash(video_path)[:32]}_{TARGET_WIDTH}x{TARGET_HEIGHT}_{TARGET_FPS}fps.mp4"
+    proxy_path = os.path.join(proxy_folder(), proxy_name)
+    if os.path.exists(proxy_path):
+        os.utime(proxy_path)
+        return proxy_path
+
+    os.makedirs(proxy_folder(), exist_ok=True)
+    partial_path = os.path.join(proxy_folder(), f"{proxy_name[:-4]}.{threading.get_ident()}.part.mp4")
+    try:
+        run_ffmpeg([
+            "-i", video_path, "-an",
+            "-vf", crop_scale_filter(TARGET_WIDTH, TARGET_HEIGHT, TARGET_FPS),
+            # one keyframe per second, no B-frames (-bf 0) and no CABAC/deblocking (fastdecode), so seeking and
+            # decoding stay cheap
+            "-c:v", "libx264", "-preset", "veryfast", "-tune", "fastdecode", "-bf", "0", "-crf", "18",
+            "-g", TARGET_FPS, "-keyint_min", TARGET_FPS, "-sc_threshold", "0",
+            "-movflags", "+faststart", partial_path,
+        ])
+        os.replace(partial_path, proxy_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    print(f"DEBUG: Normalized {os.path.basename(video_path)} to {proxy_name}")
+    return proxy_path
+
+
+def normalize_clips(video_paths):
+    with ThreadPoolExecutor(max_workers=PROXY_WORKERS) as executor:
+        return list(executor.map(normalize_clip, video_paths))
+
+
+# Function to build the inputs and filtergraph for the same timeline as build_moviepy_timeline
+# Each segment is cropped to 9:16 and scaled to the output size, the segments are concatenated, the last frame is
+# held (tpad) for freeze_duration, and the subtitles are burned in. The result is labelled [vout]
+def ffmpeg_timeline(edit_list, freeze_duration, subtitle_path, subtitle_offset=0.0):
+    input_args = []
+    filters = []
+    for index, (video_path, start, end) in enumerate(edit_list):
+        # Seeking on the input only decodes the planned range of each clip
+        input_args += ["-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", video_path]
+        filters.append(f"[{index}:v]{crop_scale_filter(TARGET_WIDTH, TARGET_HEIGHT, TARGET_FPS)}[v{index}]")
+
+    timeline = "".join(f"[v{index}]" for index in range(len(edit_list)))
+    timeline += f"concat=n={len(edit_list)}:v=1:a=0"
+    if freeze_duration > 0:
+        timeline += f",tpad=stop_mode=clone:stop_duration={freeze_duration:.3f}"
+    if subtitle_path and subtitle_offset:
+        # Shift the timestamps to where this chunk sits in the full video while the subtitles are drawn
+        timeline += f",setpts=PTS+{subtitle_offset:.3f}/TB,{subtitle_filter(subtitle_path)},setpts=PTS-STARTPTS"
+    elif subtitle_path:
+        timeline += "," + subtitle_filter(subtitle_path)
+    filters.append(timeline + "[vout]")
+    return input_args, ";".join(filters)
+
+
+# Function to render the timeline as one ffmpeg filtergraph in a single subprocess - one decode and one encode
+def render_with_ffmpeg(edit_list, freeze_duration, voiceover_path, subtitle_path, output_path):
+    input_args, filter_complex = ffmpeg_timeline(edit_list, freeze_duration, subtitle_path)
+    duration = sum(end - start for video_path, start, end in edit_list) + freeze_duration
+    run_ffmpeg(input_args + [
+        "-i", voiceover_path,
+        "-filter_complex", filter_complex,
+        "-map", "[vout]", "-map", f"{len(edit_list)}:a",
+        "-c:v", "libx264", "-preset", FFMPEG_PRESET, "-pix_fmt", "yuv420p", "-r", TARGET_FPS,
+        "-c:a", "aac", "-t", f"{duration:.3f}", "-movflags", "+faststart",
+        output_path,
+    ])
+
+
+# Function to cut the part of the timeline between start and end (seconds into the video) out of an edit list
+# Returns the edit list for that window and how much of it is the held last frame
+def slice_edit_list(edit_list, freeze_duration, start, end):
+    sliced = []
+    position = 0.0
+    for video_path, clip_in, clip_out in edit_list:
+        length = clip_out - clip_in
+        window_start, window_end = max(start, position), min(end, position + length)
+        if window_end - window_start > 0.0005:
+            sliced.append((video_path, clip_in + window_start - position, clip_in + window_end - position))
+        position += length
+    freeze_part = max(0.0, end - max(start, position))
+    if not sliced:  # the whole window is the held frame, start it from the very last frame
+        video_path, clip_in, clip_out = edit_list[-1]
+        sliced = [(video_path, clip_out - 1 / TARGET_FPS, clip_out)]
+        freeze_part = end - start - 1 / TARGET_FPS
+    return sliced, freeze_part
+
+
+# Function to split the timeline into chunks that start on a keyframe - chunks are whole GOPs (one GOP is a second)
+# and there are at least as many chunks as workers. Returns [(start, end), ...] in seconds
+def plan_render_chunks(duration, workers):
+    gop_frames = TARGET_FPS
+    total_frames = int(round(duration * TARGET_FPS))
+    chunk_gops = max(1, int(round(RENDER_CHUNK_SECONDS * TARGET_FPS / gop_frames)))
+    chunk_gops = min(chunk_gops, max(1, math.ceil(total_frames / gop_frames / workers)))
+    chunk_frames = chunk_gops * gop_frames
+    return [(first_frame / TARGET_FPS, min(first_frame + chunk_frames, total_frames) / TARGET_FPS)
+            for first_frame in range(0, total_frames, chunk_frames)]
+
+
+# Function run in a worker process - renders one chunk of the timeline (video only, subtitles included)
+def render_timeline_chunk(chunk):
+    engine, edit_list, freeze_duration, subtitle_path, offset, output_path, threads = chunk
+    duration = sum(end - start for video_path, start, end in edit_list) + freeze_duration
+    keyframe_args = ["-g", str(TARGET_FPS), "-keyint_min", str(TARGET_FPS), "-sc_threshold", "0"]
+    if engine == "ffmpeg":
+        input_args, filter_complex = ffmpeg_timeline(edit_list, freeze_duration, subtitle_path, offset)
+        run_ffmpeg(input_args + [
+            "-filter_complex", filter_complex, "-map", "[vout]", "-an",
+            "-c:v", "libx264", "-preset", FFMPEG_PRESET, "-pix_fmt", "yuv420p", "-r", TARGET_FPS,
+            "-threads", threads, *keyframe_args, "-t", f"{duration:.3f}", output_path,
+        ])
+    else:
+        with ClipPool() as pool:
+            final_video_clip, final_video = build_moviepy_timeline(pool, edit_list, freeze_duration, subtitle_path,
+                                                                   offset)
+            final_video.with_duration(duration).write_videofile(output_path, codec="libx264", audio=False,
+                                                                fps=TARGET_FPS, threads=threads,
+                                                                ffmpeg_params=keyframe_args, logger=None)
+    return output_path
+
+
+# Function to render the timeline in GOP-aligned chunks on a process pool and join them losslessly (stream copy)
+def render_parallel(edit_list, freeze_duration, voiceover_path, subtitle_path, output_path, engine):
+    started = time.perf_counter()
+    duration = sum(end - start for video_path, start, end in edit_list) + freeze_duration
+    chunks = plan_render_chunks(duration, RENDER_WORKERS)
+    workers = min(RENDER_WORKERS, len(chunks))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    chunk_folder = tempfile.mkdtemp(prefix="chunks_", dir=os.path.dirname(os.path.abspath(output_path)))
+    jobs = []
+    for index, (start, end) in enumerate(chunks):
+        chunk_edit_list, chunk_freeze = slice_edit_list(edit_list, freeze_duration, start, end)
+        jobs.append((engine, chunk_edit_list, chunk_freeze, subtitle_path, start,
+                     os.path.join(chunk_folder, f"{index:04d}.mp4"), threads))
+    try:
+        # spawn, not fork - this runs on a worker thread and a forked child could inherit a lock another thread holds
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            chunk_paths = list(executor.map(render_timeline_chunk, jobs))
+        concat_stream_copy([(chunk_path, 0.0, end - start) for chunk_path, (start, end) in zip(chunk_paths, chunks)],
+                           voiceover_path, output_path)
+    finally:
+        shutil.rmtree(chunk_folder, ignore_errors=True)
+    print(f"DEBUG: Rendered {len(chunks)} chunks on {workers} workers in {time.perf_counter() - started:.1f}s")
+
+
+# Function to check whether the edit list can be joined without re-encoding - every clip has to match the output
+# size, frame rate, codec and pixel format (always true for proxies), start on a keyframe and nothing may be frozen
+def can_stream_copy(edit_list, freeze_duration):
+    if freeze_duration > 0 or any(start for video_path, start, end in edit_list):
+        return False
+    try:
+        infos = [probe_media(video_path) for video_path, start, end in edit_list]
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return False
+    first = infos[0]
+    if None in (first["video_codec"], first["pix_fmt"]) or (first["width"], first["height"]) != (TARGET_WIDTH, TARGET_HEIGHT):
+        return False
+    return all(info["video_codec"] == first["video_codec"] and info["pix_fmt"] == first["pix_fmt"]
+               and (info["width"], info["height"]) == (first["width"], first["height"])
+               and abs(info["fps"] - TARGET_FPS) < 0.01 for info in infos)
+
+
+# Function to join compatible clips with the ffmpeg concat demuxer and copy the video stream as it is,
+# only the voiceover is encoded, so this is bound by disk speed rather than CPU
+def concat_stream_copy(edit_list, voiceover_path, output_path):
+    list_path = f"{output_path}.concat.txt"
+    lines = ["ffconcat version 1.0"]
+    for video_path, start, end in edit_list:
+        escaped_path = os.path.abspath(video_path).replace(os.sep, "/").replace("'", "'\\''")
+        lines += [f"file '{escaped_path}'", f"outpoint {end:.3f}"]
+    atomic_write_text(list_path, "\n".join(lines) + "\n")
+    duration = sum(end - start for video_path, start, end in edit_list)
+    try:
+        with atomic_output(output_path) as partial_path:
+            run_ffmpeg([
+                "-f", "concat", "-safe", "0", "-i", list_path, "-i", voiceover_path,
+                "-map", "0:v", "-map", "1:a", "-c:v", "copy", "-c:a", "aac",
+                "-t", f"{duration:.3f}", "-movflags", "+faststart", partial_path,
+            ])
+    finally:
+        os.remove(list_path)
+
+
+# Function to add subtitles to a finished video as a mov_text track, audio and video are copied untouched
+def mux_soft_subtitles(video_path, subtitle_path, output_path):
+    with atomic_output(output_path) as partial_path:
+        run_ffmpeg([
+            "-i", video_path, "-i", subtitle_path,
+            "-map", "0:v", "-map", "0:a", "-map", "1:s", "-c:v", "copy", "-c:a", "copy", "-c:s", "mov_text",
+            "-movflags", "+faststart", partial_path,
+        ])
+
+
+# Function to render the timeline with the configured engine, subtitle_path=None renders it without subtitles
+# The video only appears at output_path once it is complete, a crash mid-encode leaves no truncated file behind
+def render_video(edit_list, freeze_duration, voiceover_path, subtitle_path, output_path):
+    with atomic_output(output_path) as partial_path:
+        if PARALLEL_RENDER:
+            render_parallel(edit_list, freeze_duration, voiceover_path, subtitle_path, partial_path, RENDER_ENGINE)
+        elif RENDER_ENGINE == "ffmpeg":
+            render_with_ffmpeg(edit_list, freeze_duration, voiceover_path, subtitle_path, partial_path)
+        else:
+            render_with_moviepy(edit_list, freeze_duration, voiceover_path, subtitle_path, partial_path)
 
-        subtitle_clips.append(text_clip)
 
-    # Overlay subtitles on the video
-    final_video = CompositeVideoClip([video_clip] + subtitle_clips)
+# Function to hash the inputs of a pipeline stage - the stage's settings and its upstream outputs
+def artifact_key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
 
-    # Export the final video
-    final_video.write_videofile(output_path, codec="libx264", audio_codec="aac", fps=video_clip.fps)
 
-    print(f"DEBUG: Video with subtitles saved as: {output_path}")
+def manifest_path(topic):
+    name = sanitize_filename(normalize_topic(topic))[:40]
+    return os.path.join(ARTIFACT_FOLDER, f"{name}-{hashlib.sha256(normalize_topic(topic).encode('utf-8')).hexdigest()[:12]}.json")
 
 
-def combine_video_with_audio_and_subtitles(topic):
+# Function to load a topic's manifest - for each stage the key it was built from, its outputs and the files it wrote
+def load_manifest(topic):
+    try:
+        with open(manifest_path(topic), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"topic": topic, "stages": {}}
+
+
+def save_manifest(manifest):
+    atomic_write_text(manifest_path(manifest["topic"]), json.dumps(manifest, indent=2))
+
+
+# Settings each stage's artifacts depend on, on top of the outputs of the stages it reads
+def subtitle_style_settings():
+    return [SUBTITLE_FONT, SUBTITLE_FONT_NAME, SUBTITLE_FONT_SIZE, SUBTITLE_COLOR, SUBTITLE_STROKE_WIDTH,
+            SUBTITLE_STROKE_COLOR, TARGET_WIDTH, TARGET_HEIGHT]
+
+
+def stage_settings(name, topic):
+    if name == "script":
+        # Streaming makes the voiceover in this stage, so the TTS settings decide whether it can be reused too
+        return [script_cache_key(topic), STREAM_SCRIPT] + ([TTS_ENGINE, TTS_LANG, TTS_VOICE] if STREAM_SCRIPT else [])
+    if name == "voice":
+        return [TTS_ENGINE, TTS_LANG, TTS_VOICE]
+    if name == "subs":
+        return [SILENCE_THRESHOLD, MIN_PAUSE_FRAMES, PAUSE_SNAP_FRAMES] + subtitle_style_settings()
+    if name == "fetch":
+        return [topic.split(), TARGET_WIDTH, TARGET_HEIGHT, TARGET_FPS, RENDITION_MIN_SCALE, USE_PROXIES]
+    if name == "render":
+        return [RENDER_ENGINE, FFMPEG_PRESET, TARGET_FPS, SUBTITLE_MODE] + subtitle_style_settings()
+    if name == "finish":
+        return [RENDER_ENGINE, FFMPEG_PRESET, TARGET_FPS, SUBTITLE_MODE, WRITE_UNSUBTITLED]
+    return []
+
+
+def stage_script(topic, inputs):
+    # Streaming writes the voiceover while the script comes in, the voice stage then picks it up
+    if STREAM_SCRIPT:
+        script, voiceover_path = generate_voiceover_streaming(topic)
+        outputs = {"script": script, "voiceover": voiceover_path}
+    else:
+        outputs = {"script": generate_script(topic)}
+    # A script that did not make it into the script cache is a broken stream or an expired fallback - it is used for
+    # this run, but marked partial so the next run asks the providers again before reusing it
+    cached_script = load_cached_script(script_cache_key(topic)) or ""
+    if cached_script.split() != outputs["script"].split():  # streamed scripts come back re-joined sentence by sentence
+        outputs["partial"] = True
+    return outputs, []
+
+
+def stage_voice(topic, inputs):
+    script_outputs = inputs["script"]
+    voiceover_path = script_outputs.get("voiceover")
+    if not voiceover_path or not os.path.exists(voiceover_path):
+        voiceover_path = generate_voiceover(script_outputs["script"], topic)
+    outputs = {"voiceover": voiceover_path, "hash": file_hash(voiceover_path), "duration": audio_duration(voiceover_path)}
+    return outputs, [voiceover_path]
+
+
+def stage_subs(topic, inputs):
+    # Generate subtitles from the same script as the voiceover
+    subtitle_filename = generate_subtitles(inputs["script"]["script"], topic, inputs["voice"]["voiceover"])
+    print(f"DEBUG: Subtitle file path: {subtitle_filename}")
+    files = [subtitle_filename, ass_subtitle_path(subtitle_filename)]
+    # Hash both files, so a restyle that only changes the .ass still reaches the stages that use it
+    return {"srt": subtitle_filename, "hash": artifact_key([file_hash(path) for path in files])}, files
+
+
+def stage_fetch(topic, inputs):
     # Split the topic into keywords
     keywords = topic.split()  # This will create a list of words
     video_paths = fetch_stock_videos(keywords, topic)  # Pass the keywords as a list
@@ -283,84 +1874,329 @@ def combine_video_with_audio_and_subtitles(topic):
     if not video_paths:
         video_paths = ["default_video.mp4"]  # Fallback if no videos are found
 
-    # Load the first video
-    video_clip = VideoFileClip(video_paths[0])
-    video_duration = video_clip.duration
-
-    print(f"{fg('green')}Video Duration: {video_duration} seconds{attr('reset')}")
-
-    # Load additional videos until total duration exceeds voiceover length
-    total_video_duration = 0
-    video_clips = []
+    # Swap the originals for cropped, output-sized proxies, transcoded once per clip and reused by later renders
+    if USE_PROXIES:
+        proxy_paths = normalize_clips(video_paths)
+        pin_clips(topic, proxy_paths)
+        evict_stock_library()
+        video_paths = proxy_paths
+    return {"videos": video_paths}, video_paths
 
-    while total_video_duration < video_duration:
-        for video_path in video_paths:
-            next_video_clip = VideoFileClip(video_path)  # Load the next video
-            video_clips.append(next_video_clip)
-            total_video_duration += next_video_clip.duration
 
-            if total_video_duration >= video_duration:
-                break
-
-    # Concatenate all video clips to match or exceed the voiceover duration
-    final_video_clip = concatenate_videoclips(video_clips)
+def stage_plan(topic, inputs):
+    # Plan exactly which part of which clip covers the voiceover, from the file metadata only
+    voiceover_duration = inputs["voice"]["duration"]
+    edit_list, freeze_duration = plan_edit_list(inputs["fetch"]["videos"], voiceover_duration)
+    print(f"{fg('green')}Voiceover Duration: {voiceover_duration} seconds, using {len(edit_list)} clips"
+          f"{f' and holding the last frame for {freeze_duration} seconds' if freeze_duration else ''}{attr('reset')}")
+    return {"edit_list": edit_list, "freeze": freeze_duration}, []
 
-    # Ensure the video duration matches the voiceover duration
-    voiceover_duration = AudioFileClip(generate_voiceover(generate_script(topic), topic)).duration
-    if final_video_clip.duration < voiceover_duration:
-        # Extend the last clip by holding the last frame until the voiceover is finished
-        last_clip = video_clips[-1]
-        remaining_duration = voiceover_duration - final_video_clip.duration
-        extended_clip = last_clip.subclipped(last_clip.duration - 1,
-                                             last_clip.duration)  # Get the last second of the last clip
 
-        # Freeze this last frame
-        # Instantiate the Freeze effect with the correct parameters
-        freeze_effect = Freeze(t=extended_clip.duration, freeze_duration=remaining_duration)
+def final_video_paths(topic):
+    # Using the VIDEO_OUTPUT path from .env to save the final video
+    final_video_output_path = os.path.join(VIDEO_OUTPUT, f"{topic}_final.mp4")
+    return final_video_output_path, final_video_output_path.replace(".mp4", "_with_subs.mp4")
 
-        # Apply the freeze effect to the extended clip
-        extended_clip = freeze_effect.apply(extended_clip)
 
-        # Set the duration of the extended clip to match the remaining duration
-        extended_clip = extended_clip.with_duration(remaining_duration)
+# Function for the one full encode - the burned in video, or for soft subtitles the plain video they are muxed into
+def stage_render(topic, inputs):
+    voiceover_path = inputs["voice"]["voiceover"]
+    edit_list = [tuple(edit) for edit in inputs["plan"]["edit_list"]]
+    freeze_duration = inputs["plan"]["freeze"]
+    final_video_output_path, final_video_with_subs_path = final_video_paths(topic)
 
-        # Add FX composition with the extended clip
-        final_video_clip = concatenate_videoclips(video_clips + [extended_clip])
+    if SUBTITLE_MODE == "soft":
+        # Clips that already match the output can be joined without touching the video
+        if can_stream_copy(edit_list, freeze_duration):
+            concat_stream_copy(edit_list, voiceover_path, final_video_output_path)
+        else:
+            render_video(edit_list, freeze_duration, voiceover_path, None, final_video_output_path)
+        video_path = final_video_output_path
+    else:
+        render_video(edit_list, freeze_duration, voiceover_path, inputs["subs"]["srt"], final_video_with_subs_path)
+        video_path = final_video_with_subs_path
+    # The mtime changes with every encode, so the finish stage sees a re-render even though the path is the same
+    return {"video": video_path, "mtime": os.path.getmtime(video_path)}, [video_path]
+
+
+# Function for everything after the main encode - muxing soft subtitles, or the optional video without subtitles
+def stage_finish(topic, inputs):
+    voiceover_path = inputs["voice"]["voiceover"]
+    edit_list = [tuple(edit) for edit in inputs["plan"]["edit_list"]]
+    freeze_duration = inputs["plan"]["freeze"]
+    final_video_output_path, final_video_with_subs_path = final_video_paths(topic)
+
+    if SUBTITLE_MODE == "soft":
+        # Subtitles as a mov_text track the player draws, the video is never re-encoded for them
+        mux_soft_subtitles(inputs["render"]["video"], inputs["subs"]["srt"], final_video_with_subs_path)
+    elif WRITE_UNSUBTITLED:
+        # The version without subtitles costs a second encode unless it can be stream copied
+        if can_stream_copy(edit_list, freeze_duration):
+            concat_stream_copy(edit_list, voiceover_path, final_video_output_path)
+        else:
+            render_video(edit_list, freeze_duration, voiceover_path, None, final_video_output_path)
 
-    # Crop or resize video to vertical (9:16 aspect ratio)
-    target_width = 1080  # Adjust based on resolution
-    target_height = 1920
-    original_width, original_height = final_video_clip.size
+    print(f"DEBUG: Final video with subtitles saved at: {final_video_with_subs_path}")
+    outputs = {"video_with_subs": final_video_with_subs_path, "video": None}
+    if WRITE_UNSUBTITLED:
+        print(f"DEBUG: Final video without subtitles saved at: {final_video_output_path}")
+        outputs["video"] = final_video_output_path
+    return outputs, [path for path in outputs.values() if path]
+
+
+# The pipeline as a DAG, in run order - for each stage the stages it reads, the outputs it must produce and the
+# function that builds them. Soft subtitles are only needed after the main encode, so changing them skips it
+PIPELINE_STAGES = {
+    "script": ((), ("script",), stage_script),
+    "voice": (("script",), ("voiceover", "hash", "duration"), stage_voice),
+    "subs": (("script", "voice"), ("srt", "hash"), stage_subs),
+    "fetch": ((), ("videos",), stage_fetch),
+    "plan": (("voice", "fetch"), ("edit_list", "freeze"), stage_plan),
+    "render": (("plan", "voice") + (("subs",) if SUBTITLE_MODE != "soft" else ()), ("video", "mtime"), stage_render),
+    "finish": (("render", "subs", "plan", "voice"), ("video_with_subs", "video"), stage_finish),
+}
+
+
+# Function to run stages and everything they read as a DAG, returns {stage: outputs} for every stage that ran
+# Stages start as soon as their inputs are done, so the stock fetch runs alongside script -> voiceover -> subtitles.
+# A stage whose key (settings + upstream outputs) matches its checkpoint in the manifest and whose files still exist
+# is not run again, so a crashed or edited run picks up at the first stage that is missing or out of date.
+# Every finished stage is checkpointed to the manifest (atomically) before anything reads it, and the stage writers
+# only rename their files into place once complete. Stages in force rerun
+def execute_stages(targets, topic, manifest=None, finished=None, force=()):
+    manifest = manifest if manifest is not None else load_manifest(topic)
+    finished = finished if finished is not None else {}  # stages already settled in this run
+    manifest_lock = threading.Lock()
+
+    needed, stack = set(), list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in needed and name not in finished:
+            needed.add(name)
+            stack.extend(PIPELINE_STAGES[name][0])
+
+    def run_node(name):
+        upstream, declared_outputs, build = PIPELINE_STAGES[name]
+        inputs = {dependency: finished[dependency] for dependency in upstream}
+        key = artifact_key(name, stage_settings(name, topic), inputs)
+
+        with manifest_lock:
+            entry = manifest["stages"].get(name)
+        if name not in force and entry and entry["key"] == key and all(os.path.exists(path) for path in entry["files"]):
+            if not entry["outputs"].get("partial"):
+                print(f"{fg('cyan')}Reusing {name} artifacts for topic: {topic}{attr('reset')}")
+                return entry["outputs"]
+            # Partial outputs (a broken stream or an expired fallback script) are rebuilt on every run, if the result
+            # is the same the stages downstream still match their keys and are reused
+            print(f"{fg('yellow')}Retrying the partial {name} stage for topic: {topic}{attr('reset')}")
+
+        # Forget this stage's old checkpoint first, so a crash while rebuilding can not leave it pointing at files
+        # that are being replaced. Stages downstream keep theirs, their keys decide whether the new outputs matter
+        with manifest_lock:
+            if manifest["stages"].pop(name, None) is not None:
+                save_manifest(manifest)
+
+        print(f"{fg('blue')}Running {name} stage for topic: {topic}...{attr('reset')}")
+        outputs, files = build(topic, inputs)
+        missing = [output for output in declared_outputs if output not in outputs]
+        if missing:
+            raise ValueError(f"The {name} stage did not produce {', '.join(missing)}")
+        # Round trip through JSON so a fresh run hands downstream stages the same values a reused one would
+        outputs = json.loads(json.dumps(outputs))
+        if outputs.get("partial"):
+            print(f"{fg('yellow')}The {name} stage output is incomplete, it will be retried next run{attr('reset')}")
+        with manifest_lock:
+            manifest["stages"][name] = {"key": key, "outputs": outputs, "files": files, "created": time.time()}
+            save_manifest(manifest)
+        return outputs
+
+    running = {}
+    error = None
+    with ThreadPoolExecutor(max_workers=max(1, len(needed))) as executor:
+        while True:
+            if error is None:
+                for name in PIPELINE_STAGES:
+                    if (name in needed and name not in finished and name not in running.values()
+                            and all(dependency in finished for dependency in PIPELINE_STAGES[name][0])):
+                        running[executor.submit(run_node, name)] = name
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    finished[name] = future.result()
+                except Exception as e:
+                    # Let the stages already running finish and checkpoint, but start nothing new
+                    print(f"{fg('red')}The {name} stage failed for topic {topic}: {e}{attr('reset')}")
+                    error = error or e
+                    with manifest_lock:
+                        manifest["failed"] = {"stage": name, "error": str(e), "time": time.time()}
+                        save_manifest(manifest)
+    if error is not None:
+        raise error
+    if "failed" in manifest and all(name in finished for name in PIPELINE_STAGES):
+        del manifest["failed"]
+        save_manifest(manifest)
+    return finished
+
+
+# Function to run one stage and the stages it reads, returns its outputs. force=True reruns this stage
+def run_stage(name, topic, manifest=None, force=False, finished=None):
+    return execute_stages([name], topic, manifest, finished, force=(name,) if force else ())[name]
+
+
+# Function to find the first stage without a checkpoint (or whose files are gone), None when every stage is done
+# A partial checkpoint counts as done - the pipeline finished with it, and every run retries it anyway
+def first_incomplete_stage(manifest):
+    for name in PIPELINE_STAGES:
+        entry = manifest["stages"].get(name)
+        if not entry or not all(os.path.exists(path) for path in entry["files"]):
+            return name
+    return None
+
+
+# Function to list the topics with a manifest whose pipeline never finished, e.g. after a crash
+def resumable_topics():
+    topics = []
+    if not os.path.isdir(ARTIFACT_FOLDER):
+        return topics
+    for name in sorted(os.listdir(ARTIFACT_FOLDER)):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(ARTIFACT_FOLDER, name), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if "stages" in manifest and first_incomplete_stage(manifest):  # batch_status.json has no stages
+            topics.append(manifest["topic"])
+    return topics
+
+
+def resume_topic(topic):
+    manifest = load_manifest(topic)
+    if manifest.get("failed"):
+        print(f"{fg('yellow')}Last run stopped in the {manifest['failed']['stage']} stage: "
+              f"{manifest['failed']['error']}{attr('reset')}")
+    stage = first_incomplete_stage(manifest)
+    if stage is None:
+        print(f"{fg('green')}Every stage is already done for topic: {topic}{attr('reset')}")
+    else:
+        print(f"{fg('blue')}Resuming topic {topic} from the {stage} stage{attr('reset')}")
+    combine_video_with_audio_and_subtitles(topic)
 
-    if original_width > original_height:  # Landscape -> Crop Center
-        new_width = int(original_height * (9 / 16))
-        x_center = original_width // 2
-        final_video_clip = final_video_clip.cropped(x1=x_center - new_width // 2, x2=x_center + new_width // 2)
-    else:  # If already vertical or square, resize instead
-        final_video_clip = final_video_clip.resized(height=target_height)
 
-    # Generate script
-    script = generate_script(topic)
-    voiceover_path = generate_voiceover(script, topic)
-    subtitle_filename = generate_subtitles(script, topic)
+def combine_video_with_audio_and_subtitles(topic):
+    execute_stages(["finish"], topic)
+    print(f"{fg('green')}Video successfully created with audio and subtitles!{attr('reset')}")
+    print_provider_latency_stats()
 
-    voiceover = AudioFileClip(voiceover_path)
 
-    # Set the final video clip with the voiceover
-    final_video = final_video_clip.with_audio(voiceover)
+TOPIC_LINE = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} - (.+)$")  # topics.txt history format
 
-    # Using the VIDEO_OUTPUT path from .env to save the final video
-    final_video_output_path = os.path.join(VIDEO_OUTPUT, f"{topic}_final.mp4")
-    final_video.write_videofile(final_video_output_path, codec="libx264", audio_codec="aac", fps=24)
 
-    # Add subtitles to the final video
-    final_video_with_subs_path = final_video_output_path.replace(".mp4", "_with_subs.mp4")
-    print(f"DEBUG: Subtitle file path: {subtitle_filename}")
-    add_subtitles_to_video(final_video_output_path, subtitle_filename, final_video_with_subs_path)
-    print(f"DEBUG: Final video without subtitles saved at: {final_video_output_path}")
-    print(f"DEBUG: Final video with subtitles saved at: {final_video_with_subs_path}")
+# Function to read a topics file - "YYYY-MM-DD HH:MM:SS - topic" lines or plain topics, blanks and # comments skipped
+def read_topics_file(path):
+    topics, seen = [], set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            match = TOPIC_LINE.match(line)
+            topic = match.group(1).strip() if match else line
+            if normalize_topic(topic) not in seen:  # the same topic twice would share one manifest
+                seen.add(normalize_topic(topic))
+                topics.append(topic)
+    return topics
+
+
+def save_batch_status(statuses):
+    atomic_write_text(os.path.join(ARTIFACT_FOLDER, "batch_status.json"), json.dumps(statuses, indent=2))
+
+
+def set_batch_status(statuses, status_lock, topic, status, error=None):
+    with status_lock:
+        entry = statuses[topic]
+        entry["status"] = status
+        entry["error"] = error
+        if status == "preparing":
+            entry["started"] = time.time()
+        elif status in ("done", "failed"):
+            entry["seconds"] = round(time.time() - entry["started"], 1)
+        save_batch_status(statuses)
+    color = {"done": "green", "failed": "red"}.get(status, "blue")
+    print(f"{fg(color)}[{status}] {topic}{f': {error}' if error else ''}{attr('reset')}")
+
+
+# Function to make a video for every topic without any prompts
+# Script, voiceover, subtitles, downloads and planning are network bound and run on BATCH_IO_WORKERS threads.
+# Renders are CPU bound and queue for BATCH_RENDER_WORKERS slots, so downloads for the next topics overlap them.
+# Status per topic is printed and kept in ARTIFACT_FOLDER/batch_status.json, a failed topic does not stop the run
+def run_batch(topics):
+    global headless
+    headless = True  # a failed script goes through SCRIPT_FAILURE_POLICY instead of waiting for a paste
+    started = time.time()
+    statuses = {topic: {"status": "queued", "error": None, "started": started} for topic in topics}
+    status_lock = threading.Lock()
+    print(f"{fg('blue')}Batch of {len(topics)} topics with {BATCH_IO_WORKERS} I/O and "
+          f"{BATCH_RENDER_WORKERS} render workers{attr('reset')}")
+
+    def render_topic(topic, manifest, finished):
+        try:
+            set_batch_status(statuses, status_lock, topic, "rendering")
+            execute_stages(["finish"], topic, manifest, finished)
+            set_batch_status(statuses, status_lock, topic, "done")
+        except Exception as e:
+            set_batch_status(statuses, status_lock, topic, "failed", str(e))
+        finally:
+            unpin_clips(topic)  # rendered (or given up on), its clips may be evicted now
 
-    print(f"{fg('green')}Video successfully created with audio and subtitles!{attr('reset')}")
+    with ThreadPoolExecutor(max_workers=BATCH_RENDER_WORKERS) as render_pool:
+        def prepare_topic(topic):
+            try:
+                set_batch_status(statuses, status_lock, topic, "preparing")
+                manifest, finished = load_manifest(topic), {}
+                execute_stages(["subs", "plan"], topic, manifest, finished)
+                pin_clips(topic, finished["fetch"]["videos"])  # also when the fetch came from the manifest
+                render_pool.submit(render_topic, topic, manifest, finished)
+            except ScriptUnavailable as e:
+                unpin_clips(topic)
+                status = {"skip": "skipped", "retry": "retry"}.get(e.policy, "failed")
+                set_batch_status(statuses, status_lock, topic, status, str(e))
+            except Exception as e:
+                unpin_clips(topic)
+                set_batch_status(statuses, status_lock, topic, "failed", str(e))
+
+        # Topics whose script failed under the 'retry' policy get another pass once the rest are through
+        pending = topics
+        for retry_round in range(SCRIPT_RETRY_ROUNDS + 1):
+            with ThreadPoolExecutor(max_workers=BATCH_IO_WORKERS) as io_pool:
+                list(io_pool.map(prepare_topic, pending))
+            pending = [topic for topic in topics if statuses[topic]["status"] == "retry"]
+            if not pending or retry_round == SCRIPT_RETRY_ROUNDS:
+                break
+            print(f"{fg('yellow')}Retrying {len(pending)} topics in {SCRIPT_RETRY_DELAY:.0f} seconds{attr('reset')}")
+            time.sleep(SCRIPT_RETRY_DELAY)
+
+    elapsed = time.time() - started
+    done = [topic for topic, entry in statuses.items() if entry["status"] == "done"]
+    failed = [topic for topic, entry in statuses.items() if entry["status"] == "failed"]
+    skipped = [topic for topic, entry in statuses.items() if entry["status"] == "skipped"]
+    print(f"{fg('green')}Batch finished: {len(done)} done, {len(failed)} failed, {len(skipped)} skipped, "
+          f"{len(pending)} left to retry in {elapsed / 60:.1f} minutes, "
+          f"{len(done) * 3600 / elapsed if elapsed else 0:.1f} videos/hour{attr('reset')}")
+    for topic in failed:
+        print(f"{fg('red')}  failed: {topic} - {statuses[topic]['error']}{attr('reset')}")
+    if pending:
+        # Same format as topics.txt, so the leftovers can be fed straight back into a later batch
+        retry_path = os.path.join(ARTIFACT_FOLDER, "retry_topics.txt")
+        queued_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        atomic_write_text(retry_path, "".join(f"{queued_at} - {topic}\n" for topic in pending))
+        print(f"{fg('yellow')}{len(pending)} topics still waiting for a script, queued in {retry_path}{attr('reset')}")
+    print_provider_latency_stats()
+    return statuses
 
 
 
@@ -413,10 +2249,54 @@ def combine_video_with_audio_and_subtitles(topic):
 #     print(f"{fg('green')}Video successfully created with audio and subtitles!{attr('reset')}")
 
 def main():
-    # I have commented out the input and just set topic to "chicken and eggs" to speed up process of debugging
+    import argparse
+    parser = argparse.ArgumentParser(description="Make a narrated, subtitled short video about a topic. "
+                                                 "Without a command you are asked for a topic and every stage runs.")
+    commands = parser.add_subparsers(dest="command")
+    for name in ["script", "voice", "subs", "fetch", "plan", "render", "all"]:
+        command = commands.add_parser(name, help="run every stage" if name == "all" else
+                                      f"run the {name} stage, reusing the artifacts of the stages before it")
+        command.add_argument("topic", nargs="+")
+    batch = commands.add_parser("batch", help="make a video for every topic in a topics file, no prompts")
+    batch.add_argument("topics_file", help="'YYYY-MM-DD HH:MM:SS - topic' lines like topics.txt, or one topic per line")
+    resume = commands.add_parser("resume", help="continue a topic from its first unfinished stage, "
+                                                "without a topic every unfinished topic is resumed as a batch")
+    resume.add_argument("topic", nargs="*")
+    args = parser.parse_args()
 
-    topic = input(f"{fg('blue')}Enter a topic for the video: {attr('reset')}")
-    combine_video_with_audio_and_subtitles(topic)
+    try:
+        if args.command is None:
+            # I have commented out the input and just set topic to "chicken and eggs" to speed up process of debugging
+
+            topic = input(f"{fg('blue')}Enter a topic for the video: {attr('reset')}")
+            combine_video_with_audio_and_subtitles(topic)
+        elif args.command == "batch":
+            statuses = run_batch(read_topics_file(args.topics_file))
+            exit(1 if any(entry["status"] == "failed" for entry in statuses.values()) else 0)
+        elif args.command == "resume" and not args.topic:
+            statuses = run_batch(resumable_topics())
+            exit(1 if any(entry["status"] == "failed" for entry in statuses.values()) else 0)
+        elif args.command == "resume":
+            resume_topic(" ".join(args.topic))
+        elif args.command == "all":
+            combine_video_with_audio_and_subtitles(" ".join(args.topic))
+        elif args.command == "render":
+            # Re-encode, then redo whatever comes after the encode
+            finished = execute_stages(["finish"], " ".join(args.topic), force=("render",))
+            print(json.dumps(finished["finish"], indent=2))
+        else:
+            # The named stage always runs again, everything it reads comes from the manifest when still valid
+            # With streaming the voiceover is made by the script stage, so redoing the voice means redoing that
+            force = ("script", "voice") if args.command == "voice" and STREAM_SCRIPT else (args.command,)
+            finished = execute_stages([args.command], " ".join(args.topic), force=force)
+            outputs = finished[args.command]
+            print(json.dumps(outputs, indent=2) if args.command != "script" else outputs["script"])
+    except ScriptUnavailable as e:
+        # Only batch runs have a retry queue, a single run just reports what the policy decided
+        outcome = {"skip": "Skipped the topic", "retry": "Run it again later (or put it in a batch topics file)",
+                   "cached": "There is no cached script to fall back on"}.get(e.policy, "Giving up on the topic")
+        print(f"{fg('red')}{e}. {outcome}.{attr('reset')}")
+        exit(1)
 
 if __name__ == "__main__":
     main()